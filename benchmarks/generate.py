@@ -0,0 +1,425 @@
+"""生成基准测试程序
+
+Mandelbrot 和汉诺塔这两个经典 Brainfuck 负载由下面的 Builder 生成，
+其余负载为按参数拼接的简单程序。运行本文件会核对生成的程序并重写 programs/ 下的 .t 文件:
+
+    python benchmarks/generate.py
+"""
+import os
+from contextlib import contextmanager
+
+PROGRAM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'programs')
+
+class Builder:
+    """在固定单元上生成 Brainfuck 代码的简单汇编器
+
+    每个变量占一个单元，临时单元用完后必须清零再释放。
+    所有值都是模256的，有符号数按补码解释。
+    """
+
+    def __init__(self):
+        self.out = []
+        self.position = 0
+        self.next_cell = 0
+        self.free_cells = []
+        self.divmod_block = None
+
+    def code(self):
+        return ''.join(self.out)
+
+    def var(self):
+        if self.free_cells:
+            self.free_cells.sort()
+            return self.free_cells.pop(0)
+        self.next_cell += 1
+        return self.next_cell - 1
+
+    def release(self, *cells):
+        self.free_cells.extend(cells)
+
+    def at(self, cell):
+        diff = cell - self.position
+        self.out.append('>' * diff if diff > 0 else '<' * -diff)
+        self.position = cell
+
+    def emit(self, cell, text):
+        self.at(cell)
+        self.out.append(text)
+
+    def add(self, cell, n):
+        n %= 256
+        self.emit(cell, '+' * n if n <= 128 else '-' * (256 - n))
+
+    def clear(self, cell):
+        self.emit(cell, '[-]')
+
+    def set(self, cell, n):
+        self.clear(cell)
+        self.add(cell, n)
+
+    def output(self, cell):
+        self.emit(cell, '.')
+
+    @contextmanager
+    def loop(self, cell):
+        self.emit(cell, '[')
+        yield
+        self.emit(cell, ']')
+
+    def move(self, source, targets):
+        """将source的值乘以系数加到targets中的各单元，source清零"""
+        with self.loop(source):
+            self.add(source, -1)
+            for target, factor in targets.items():
+                self.add(target, factor)
+
+    def copy(self, source, targets):
+        """将source的值乘以系数加到targets中的各单元，source保持不变"""
+        temp = self.var()
+        self.move(source, {**targets, temp: 1})
+        self.move(temp, {source: 1})
+        self.release(temp)
+
+    @contextmanager
+    def if_nonzero(self, cell):
+        temp = self.var()
+        self.copy(cell, {temp: 1})
+        with self.loop(temp):
+            yield
+            self.clear(temp)
+        self.release(temp)
+
+    @contextmanager
+    def if_zero(self, cell):
+        flag = self.var()
+        self.set(flag, 1)
+        with self.if_nonzero(cell):
+            self.clear(flag)
+        with self.loop(flag):
+            yield
+            self.clear(flag)
+        self.release(flag)
+
+    def divmod(self, n, d, quotient, remainder):
+        """quotient, remainder += divmod(n, d)，n清零"""
+        if d == 1:
+            self.move(n, {quotient: 1})
+            return
+        # 经典的除法片段，需要7个连续单元: n 0 d 0 0 0 0 -> 0 n d-n%d n%d n/d 0 0
+        if self.divmod_block is None:
+            self.divmod_block = self.next_cell
+            self.next_cell += 7
+        base = self.divmod_block
+        self.move(n, {base: 1})
+        self.add(base + 2, d)
+        self.emit(base, '[->+>-[>+>>]>[+[-<+>]>+>>]<<<<<<]')
+        self.clear(base + 1)
+        self.clear(base + 2)
+        self.move(base + 3, {remainder: 1})
+        self.move(base + 4, {quotient: 1})
+
+    def negate(self, cell):
+        temp = self.var()
+        self.move(cell, {temp: -1})
+        self.move(temp, {cell: 1})
+        self.release(temp)
+
+    def sign(self, cell, flag):
+        """flag += 1 如果cell按补码为负数，要求|cell| <= 64
+
+        加64后负数回绕到 [0, 64)，非负数落在 [64, 128]，只需与64比较。
+        """
+        temp, quotient, remainder = self.var(), self.var(), self.var()
+        self.copy(cell, {temp: 1})
+        self.add(temp, 64)
+        self.divmod(temp, 64, quotient, remainder)
+        self.clear(remainder)
+        with self.if_zero(quotient):
+            self.add(flag, 1)
+        self.clear(quotient)
+        self.release(temp, quotient, remainder)
+
+    def absolute(self, cell, result):
+        """result += |cell|，要求|cell| <= 64"""
+        negative = self.var()
+        self.copy(cell, {result: 1})
+        self.sign(cell, negative)
+        with self.loop(negative):
+            self.negate(result)
+            self.clear(negative)
+        self.release(negative)
+
+    def mul_div(self, a, b, d, result):
+        """result += trunc(a * b / d)，按有符号数计算，要求|a*b| < 256"""
+        ma, mb, signs = self.var(), self.var(), self.var()
+        self.absolute(a, ma)
+        self.absolute(b, mb)
+        product = self.var()
+        with self.loop(mb):
+            self.add(mb, -1)
+            self.copy(ma, {product: 1})
+        self.clear(ma)
+        remainder = self.var()
+        self.divmod(product, d, result, remainder)
+        self.clear(remainder)
+        self.sign(a, signs)
+        self.sign(b, signs)
+        self.add(signs, -1)
+        with self.if_zero(signs):
+            self.negate(result)
+        self.clear(signs)
+        self.release(ma, mb, signs, product, remainder)
+
+    def at_least(self, cell, k, flag):
+        """flag 为非0值如果 cell(无符号) >= k"""
+        temp, remainder = self.var(), self.var()
+        self.copy(cell, {temp: 1})
+        self.divmod(temp, k, flag, remainder)
+        self.clear(remainder)
+        self.release(temp, remainder)
+
+# Mandelbrot 使用定点数，SCALE 表示 1.0
+SCALE = 8
+MANDELBROT_COLUMNS = 25
+MANDELBROT_ROWS = 17
+MANDELBROT_ITERATIONS = 20
+
+def mandelbrot_reference():
+    """与生成的程序使用相同整数运算的参考实现"""
+    def mul_div(a, b, d):
+        q = abs(a * b) // d
+        return -q if (a < 0) != (b < 0) else q
+
+    lines = []
+    for y in range(MANDELBROT_ROWS):
+        ci = y - SCALE
+        row = ''
+        for x in range(MANDELBROT_COLUMNS):
+            cr = x - 2 * SCALE
+            zr = zi = it = 0
+            inside = True
+            while it < MANDELBROT_ITERATIONS:
+                if abs(zr) >= 2 * SCALE or abs(zi) >= 2 * SCALE:
+                    inside = False
+                    break
+                zr2, zi2 = mul_div(zr, zr, SCALE), mul_div(zi, zi, SCALE)
+                if zr2 + zi2 > 4 * SCALE:
+                    inside = False
+                    break
+                zr, zi = zr2 - zi2 + cr, 2 * mul_div(zr, zi, SCALE) + ci
+                it += 1
+            row += '#' if inside else chr(ord('a') + it)
+        lines.append(row + '\n')
+    return ''.join(lines)
+
+def mandelbrot():
+    b = Builder()
+    ci, cr, rows, cols = b.var(), b.var(), b.var(), b.var()
+    zr, zi, it, count, running, inside = (b.var() for _ in range(6))
+    b.set(ci, -SCALE)
+    b.set(rows, MANDELBROT_ROWS)
+    with b.loop(rows):
+        b.set(cr, -2 * SCALE)
+        b.set(cols, MANDELBROT_COLUMNS)
+        with b.loop(cols):
+            for cell in (zr, zi, it):
+                b.clear(cell)
+            b.set(count, MANDELBROT_ITERATIONS)
+            b.set(running, 1)
+            b.set(inside, 1)
+            with b.loop(running):
+                escaped, magnitude = b.var(), b.var()
+                for z in (zr, zi):
+                    b.absolute(z, magnitude)
+                    b.at_least(magnitude, 2 * SCALE, escaped)
+                    b.clear(magnitude)
+                b.release(magnitude)
+                with b.if_zero(escaped):
+                    zr2, zi2 = b.var(), b.var()
+                    b.mul_div(zr, zr, SCALE, zr2)
+                    b.mul_div(zi, zi, SCALE, zi2)
+                    total = b.var()
+                    b.copy(zr2, {total: 1})
+                    b.copy(zi2, {total: 1})
+                    b.at_least(total, 4 * SCALE + 1, escaped)
+                    b.clear(total)
+                    with b.if_zero(escaped):
+                        product = b.var()
+                        b.mul_div(zr, zi, SCALE, product)
+                        b.clear(zr)
+                        b.move(zr2, {zr: 1})
+                        b.move(zi2, {zr: -1})
+                        b.copy(cr, {zr: 1})
+                        b.clear(zi)
+                        b.move(product, {zi: 2})
+                        b.copy(ci, {zi: 1})
+                        b.add(it, 1)
+                        b.add(count, -1)
+                        with b.if_zero(count):
+                            b.clear(running)
+                        b.release(product)
+                    b.clear(zr2)
+                    b.clear(zi2)
+                    b.release(zr2, zi2, total)
+                with b.if_nonzero(escaped):
+                    b.clear(running)
+                    b.clear(inside)
+                b.clear(escaped)
+                b.release(escaped)
+            char = b.var()
+            b.copy(it, {char: 1})
+            b.add(char, ord('a'))
+            with b.loop(inside):
+                b.set(char, ord('#'))
+                b.clear(inside)
+            b.output(char)
+            b.clear(char)
+            b.release(char)
+            b.add(cr, 1)
+            b.add(cols, -1)
+        newline = b.var()
+        b.set(newline, ord('\n'))
+        b.output(newline)
+        b.clear(newline)
+        b.release(newline)
+        b.add(ci, 1)
+        b.add(rows, -1)
+    return b.code()
+
+# 汉诺塔的盘数，移动编号需要在8位以内完成位运算
+HANOI_DISCS = 7
+HANOI_ROUNDS = 4
+
+def hanoi_reference():
+    moves = []
+    for m in range(1, 2 ** HANOI_DISCS):
+        source = (m & (m - 1)) % 3
+        target = ((m | (m - 1)) + 1) % 3
+        moves.append(f"{'ABC'[source]}{'ABC'[target]}\n")
+    return ''.join(moves) * HANOI_ROUNDS
+
+def hanoi():
+    """迭代解法: 第m步从 (m & (m-1)) % 3 移到 ((m | (m-1)) + 1) % 3，位运算逐位计算"""
+    b = Builder()
+    rounds, m, steps = b.var(), b.var(), b.var()
+    b.set(rounds, HANOI_ROUNDS)
+    with b.loop(rounds):
+        b.set(m, 1)
+        b.set(steps, 2 ** HANOI_DISCS - 1)
+        with b.loop(steps):
+            x, y, both, either, bit = (b.var() for _ in range(5))
+            b.copy(m, {x: 1})
+            b.copy(m, {y: 1})
+            b.add(y, -1)
+            b.set(bit, 1)
+            for _ in range(HANOI_DISCS):
+                bx, by, qx, qy = (b.var() for _ in range(4))
+                b.divmod(x, 2, qx, bx)
+                b.divmod(y, 2, qy, by)
+                b.move(qx, {x: 1})
+                b.move(qy, {y: 1})
+                b.move(by, {bx: 1})
+                with b.if_nonzero(bx):
+                    b.copy(bit, {either: 1})
+                b.add(bx, -2)
+                with b.if_zero(bx):
+                    b.copy(bit, {both: 1})
+                b.clear(bx)
+                temp = b.var()
+                b.move(bit, {temp: 2})
+                b.move(temp, {bit: 1})
+                b.release(bx, by, qx, qy, temp)
+            b.clear(x)
+            b.clear(y)
+            b.clear(bit)
+            b.add(either, 1)
+            for value in (both, either):
+                quotient, peg = b.var(), b.var()
+                b.divmod(value, 3, quotient, peg)
+                b.clear(quotient)
+                b.add(peg, ord('A'))
+                b.output(peg)
+                b.clear(peg)
+                b.release(quotient, peg)
+            b.set(x, ord('\n'))
+            b.output(x)
+            b.clear(x)
+            b.release(x, y, both, either, bit)
+            b.add(m, 1)
+            b.add(steps, -1)
+        b.add(rounds, -1)
+    return b.code()
+
+def hello_world():
+    """print_full_docs 中的示例"""
+    return ("++++++++[>++++++++>+++++++++++>+++++<<<-]>.>++.+++++++..+++.>-.\n"
+            "------------.<++++++++.--------.+++.------.--------.>+.\n")
+
+def transfer_chain(length=2000, rounds=200):
+    """沿着长度为length的单元链反复执行 [->+<]"""
+    body = '+' * 100 + '[->+<]>' * length + '[-]' + '<' * length
+    return '>' + '+' * rounds + '[>' + body + '<-]'
+
+def tape_ops(rounds=64):
+    """三重循环中反复执行纸带A/B之间的 !@#$%^&* 运算"""
+    body = '+++#@$%^&*!#&!@[-]'
+    count = '+' * rounds
+    return f"{count}[>{count}[>{count}[>{body}<-]<-]<-]"
+
+def pointer_walk(stride=100, rounds=255):
+    """每轮向右留下一串标记走到很远，再清除标记走回原点，触发纸带扩展和收缩"""
+    step = '>' * stride
+    back = '<' * stride
+    walk = f"{step}-[[-{step}+{back}]+{step}-]{back}[-{back}]"
+    return '>' * 5 + '+' * rounds + '[' + '<' * 5 + walk + '>' * 5 + '-]'
+
+def output_heavy(rounds=64):
+    """连续输出大量字节"""
+    count = '+' * rounds
+    return f"{count}[>{count}[>{count}[>.+<-]<-]<-]"
+
+def input_heavy():
+    """cat: 将输入原样输出"""
+    return ',[.,]'
+
+PROGRAMS = {
+    'hello': hello_world,
+    'mandelbrot': mandelbrot,
+    'hanoi': hanoi,
+    'transfer_chain': transfer_chain,
+    'tape_ops': tape_ops,
+    'pointer_walk': pointer_walk,
+    'output_heavy': output_heavy,
+    'input_heavy': input_heavy,
+}
+
+# 有参考实现的程序，生成后用解释器执行并核对输出
+REFERENCES = {
+    'mandelbrot': mandelbrot_reference,
+    'hanoi': hanoi_reference,
+}
+
+def check(name, code):
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(PROGRAM_DIR), '..', 'src', 'interpreter'))
+    import V1
+
+    output = bytearray()
+    interpreter = V1.TuringInterpreter()
+    interpreter.backend = 'python'
+    interpreter.set_output(output.extend)
+    interpreter.execute(code)
+    if output.decode('latin-1') != REFERENCES[name]():
+        raise SystemExit(f"{name}: 输出与参考实现不一致")
+
+def main():
+    os.makedirs(PROGRAM_DIR, exist_ok=True)
+    for name, generate in PROGRAMS.items():
+        code = generate()
+        if name in REFERENCES:
+            check(name, code)
+        with open(os.path.join(PROGRAM_DIR, name + '.t'), 'w') as f:
+            f.write(code)
+
+if __name__ == '__main__':
+    main()
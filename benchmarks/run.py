@@ -0,0 +1,206 @@
+"""运行基准测试
+
+用法: python benchmarks/run.py [选项] [测试名...]
+
+选项:
+  -b, --backend 后端   只测试指定后端(bytecode、python 或 tiered)，可以重复
+  -r, --repeat 次数    每项测试重复的次数，取最短时间(默认3)
+  -o, --output 文件    将结果写为JSON
+  -c, --compare 文件   与之前保存的JSON结果比较
+
+每项测试报告执行的源指令数、墙钟时间、每秒源指令数和峰值内存(在单独的进程中测量)。
+源指令数按未优化的语义计数(连续的+-<>按字符数计)，与后端和优化无关，不同后端之间可以直接比较。
+"""
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..', 'src', 'interpreter'))
+
+import V1
+
+PROGRAM_DIR = os.path.join(BENCHMARK_DIR, 'programs')
+# 源指令数的计算较慢，结果按程序和输入的哈希缓存在这里
+COUNTS_PATH = os.path.join(PROGRAM_DIR, 'instruction_counts.json')
+BACKENDS = ('bytecode', 'python', 'tiered')
+
+def make_input(size):
+    """生成不含0字节的确定性输入"""
+    return bytes(i % 255 + 1 for i in range(size))
+
+# 各测试的输入数据
+INPUTS = {
+    'input_heavy': make_input(1 << 20),
+}
+
+def count_instructions(code, data):
+    """按未优化的语义执行程序，返回执行的源指令数"""
+    interpreter = V1.TuringInterpreter()
+    interpreter.set_input(data)
+    interpreter.set_output(lambda data: None)
+    interpreter.profiler = V1.Profiler()
+    interpreter.execute(code)
+    return interpreter.profiler.total()
+
+def cached_instruction_count(counts, code, data):
+    """从缓存中取源指令数，没有时计算并加入缓存"""
+    key = hashlib.sha256(code.encode() + b'\0' + data).hexdigest()
+    if key not in counts:
+        counts[key] = count_instructions(code, data)
+    return counts[key]
+
+def run_once(code, data, backend):
+    """执行一次程序，返回墙钟时间和输出的字节数"""
+    interpreter = V1.TuringInterpreter()
+    interpreter.backend = backend
+    interpreter.set_input(data)
+    output_size = 0
+
+    def discard(data):
+        nonlocal output_size
+        output_size += len(data)
+
+    interpreter.set_output(discard, line_buffered=False)
+    start = time.perf_counter()
+    interpreter.execute(code)
+    return time.perf_counter() - start, output_size
+
+def measure_peak_memory(code, data, backend):
+    """在子进程中执行，返回该进程的峰值常驻内存(字节)"""
+    run_once(code, data, backend)
+    try:
+        # Linux上ru_maxrss会继承exec之前父进程的峰值，优先读取只属于当前进程的VmHWM
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS上单位为字节，其他系统为KiB
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def peak_memory(code, data, backend):
+    """在新启动的进程中单独执行一次，测量峰值内存，不支持的平台返回None"""
+    if resource is None:
+        return None
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(measure_peak_memory, code, data, backend).result()
+
+def run_benchmarks(names, backends, repeat):
+    results = []
+    try:
+        with open(COUNTS_PATH) as f:
+            counts = json.load(f)
+    except FileNotFoundError:
+        counts = {}
+    known_counts = len(counts)
+
+    for name in names:
+        with open(os.path.join(PROGRAM_DIR, name + '.t')) as f:
+            code = f.read()
+        data = INPUTS.get(name, b'')
+        instructions = cached_instruction_count(counts, code, data)
+        for backend in backends:
+            times = []
+            for _ in range(repeat):
+                elapsed, output_size = run_once(code, data, backend)
+                times.append(elapsed)
+            wall_time = min(times)
+            result = {
+                'benchmark': name,
+                'backend': backend,
+                'wall_time': wall_time,
+                'instructions': instructions,
+                'instructions_per_second': instructions / wall_time if wall_time and instructions else None,
+                'peak_memory': peak_memory(code, data, backend),
+                'output_bytes': output_size,
+            }
+            results.append(result)
+            print_result(result)
+
+    if len(counts) != known_counts:
+        with open(COUNTS_PATH, 'w') as f:
+            json.dump(counts, f, indent=2, sort_keys=True)
+    return results
+
+def print_result(result, baseline=None):
+    line = (f"{result['benchmark']:<16} {result['backend']:<9} {result['wall_time']:9.4f} 秒 "
+            f"{(result['instructions_per_second'] or 0) / 1e6:9.2f} M指令/秒 "
+            f"{(result['peak_memory'] or 0) / 1024 / 1024:7.1f} MiB")
+    if baseline is not None:
+        line += f"  {baseline['wall_time'] / result['wall_time']:6.2f}x"
+    print(line)
+
+def compare(results, path):
+    """打印相对之前结果的加速比(>1表示变快)"""
+    with open(path) as f:
+        previous = json.load(f)
+    baselines = {(r['benchmark'], r['backend']): r for r in previous['results']}
+    print(f"\n与 {path} 比较:")
+    for result in results:
+        baseline = baselines.get((result['benchmark'], result['backend']))
+        if baseline is not None:
+            print_result(result, baseline)
+
+def main():
+    args = sys.argv[1:]
+    backends = []
+    repeat = 3
+    output_path = None
+    compare_path = None
+
+    while args and args[0].startswith('-'):
+        option = args.pop(0)
+        if option in ('-b', '--backend') and args:
+            backend = args.pop(0)
+            if backend not in BACKENDS:
+                print(f"未知后端: {backend}，可选: {', '.join(BACKENDS)}")
+                return
+            backends.append(backend)
+        elif option in ('-r', '--repeat') and args:
+            repeat = int(args.pop(0))
+        elif option in ('-o', '--output') and args:
+            output_path = args.pop(0)
+        elif option in ('-c', '--compare') and args:
+            compare_path = args.pop(0)
+        else:
+            print(__doc__)
+            return
+
+    available = sorted(name[:-2] for name in os.listdir(PROGRAM_DIR) if name.endswith('.t'))
+    names = args or available
+    for name in names:
+        if name not in available:
+            print(f"未知测试: {name}，可选: {', '.join(available)}")
+            return
+
+    results = run_benchmarks(names, backends or list(BACKENDS), repeat)
+
+    if compare_path:
+        compare(results, compare_path)
+    if output_path:
+        report = {
+            'interpreter_version': V1.INTERPRETER_VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeat': repeat,
+            'results': results,
+        }
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
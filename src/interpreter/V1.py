@@ -1,12 +1,1031 @@
 import sys
+import os
 import re
+import hashlib
+import marshal
+import mmap
+import struct
+import tempfile
+import time
+import functools
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import namedtuple, deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import readline  # 用于改进命令行输入体验
 
+# 解释器版本，编译结果的格式或优化规则变化时需要更新，使旧的缓存失效
+INTERPRETER_VERSION = '1.3'
+
+# 中间表示(IR)的操作码，每条指令为 (操作码, 操作数)
+OP_ADD = 0    # 纸带B当前值加n (连续的+和-折叠为一条)
+OP_MOVE = 1   # 指针移动n (连续的>或<折叠为一条)
+OP_OUT = 2    # .
+OP_IN = 3     # ,
+OP_JZ = 4     # [ 操作数为当前值为0时的跳转目标
+OP_JNZ = 5    # ] 操作数为当前值不为0时的跳转目标
+OP_SWAP = 6   # !
+OP_LOAD = 7   # @
+OP_STORE = 8  # #
+OP_ADDA = 9   # $
+OP_SUBA = 10  # %
+OP_MULA = 11  # ^
+OP_DIVA = 12  # &
+OP_XORA = 13  # *
+OP_CLEAR = 14   # [-] 之类的清零循环
+OP_SCAN = 15    # [>] 之类的扫描循环，操作数为步长
+OP_MULADD = 16  # [->+<] 之类的乘加/转移循环
+OP_BREAK = 17   # 调试器插入的断点，操作数为预处理后代码中的位置。只由字节码解释器执行
+OP_BLOCK = 18   # 按相对指针的偏移访问单元的一段直线指令，之后紧跟被替代的原指令
+OP_PRESET = 19  # 编译时执行程序前缀的结果，只出现在开头，见 TuringInterpreter.evaluate_prefix
+OP_LOOP = 20    # 分层执行时已编译为Python函数的循环，替换循环开头的[，操作数与OP_JZ相同。不会保存到文件
+
+# 单字符指令到操作码的映射
+SIMPLE_OPS = {
+    '.': OP_OUT, ',': OP_IN,
+    '!': OP_SWAP, '@': OP_LOAD, '#': OP_STORE,
+    '$': OP_ADDA, '%': OP_SUBA, '^': OP_MULA, '&': OP_DIVA, '*': OP_XORA,
+}
+
+# 折叠连续的+/-，以及同方向的连续>或<
+TOKEN_PATTERN = re.compile(r'[+\-]+|>+|<+|.', re.S)
+
+# 可以出现在乘加循环中的单元操作，它们对纸带B的作用都是仿射变换 b -> m*b + c
+LOOP_CELL_OPS = (OP_ADD, OP_ADDA, OP_SUBA, OP_MULA, OP_LOAD, OP_XORA)
+
+# 可以合并进OP_BLOCK的指令: 指针移动和只访问指针处单元的操作
+OFFSET_OPS = frozenset((OP_ADD, OP_MOVE, OP_OUT, OP_IN, OP_SWAP, OP_LOAD, OP_STORE,
+                        OP_ADDA, OP_SUBA, OP_MULA, OP_DIVA, OP_XORA))
+
+# , 指令读到输入结尾时的处理方式: 存入0、保持原值、存入-1(255)
+EOF_MODES = ('0', 'unchanged', '-1')
+
+# 纸带的初始(也是最小)长度
+TAPE_MIN_SIZE = 500
+
+# 指针跳到纸带长度两倍以外、扩展后的长度又超过该值时，改用按页稀疏存储的纸带(PagedTape)。
+# 指针逐步移动时纸带是连续使用的，仍按倍增扩展bytearray
+PAGED_TAPE_THRESHOLD = 1 << 20
+
+# 稀疏纸带每页的单元数
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+
+# 编译缓存的默认目录和大小上限(字节)
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                         'turing')
+CACHE_MAX_SIZE = 64 * 1024 * 1024
+
+# 执行结果缓存(ResultCache)的默认大小上限(字节)
+RESULT_CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+# 执行结果缓存文件(.tro)的格式，所有整数均为小端序:
+#   文件头  魔数 b'TRO\0'、格式版本(u16)、标志(u16，保留为0)、指针(i64)、
+#           纸带A长度(u32)、纸带B长度(u32)、输出长度(u64)
+#   之后依次为去掉末尾0的纸带A、纸带B和程序的全部输出
+RESULT_MAGIC = b'TRO\0'
+RESULT_VERSION = 1
+RESULT_HEADER = struct.Struct('<4sHHqIIQ')
+
+# 从结果缓存输出时每次读取的字节数
+RESULT_CHUNK_SIZE = 65536
+
+# T字节码文件(.tbc)的格式，所有整数均为小端序:
+#   文件头  魔数 b'TBC\0'、格式版本(u16)、标志(u16)、指令数N(u32)、常量数M(u32)
+#   操作码  N个u8，之后补0到4字节对齐
+#   操作数  N个i32。跳转指令为目标位置(未匹配时为-1)，OP_MULADD和OP_BLOCK为常量区中的起始下标，
+#           无操作数时为0
+#   常量区  M个i32，依次存放每条OP_MULADD的 low, high, inverse, 加法单元数, (偏移, 增量)...,
+#           其他单元数, 每个单元的 (偏移, 运算数, (操作码, 操作数)...)，
+#           以及每条OP_BLOCK的 low, high, 净位移, 原指令数, 加法单元数, (偏移, 增量)...,
+#           其他操作数, (偏移, 操作码, 操作数)...，
+#           OP_PRESET的 继续执行的位置, 指针, 纸带A长度, 纸带B长度, 输出长度, 之后是三者依次连接、
+#           补0到4字节对齐后按小端序每4字节存为一个i32
+# 版本2增加了OP_BLOCK，版本3增加了OP_PRESET，旧版本的文件仍然可以读取
+TBC_MAGIC = b'TBC\0'
+TBC_VERSION = 3
+TBC_HEADER = struct.Struct('<4sHHII')
+TBC_FLAG_LOOPS = 1  # 已识别常见循环模式(优化级别>=1)
+
+# 检查点文件(.tck)的格式，所有整数均为小端序:
+#   文件头  魔数 b'TCK\0'、格式版本(u16)、标志(u16)、数据指针(i64)、指令位置(i64)、纸带长度(i64)、
+#           程序的压缩长度(u32)、待读输入的压缩长度(u32)、页数K(u32)
+#   程序    zlib压缩的.tbc数据
+#   输入    zlib压缩的已读入但还未被程序读取的输入
+#   页表    K项，每项为 纸带(u8, 0为A, 1为B)、页号(i64)、压缩长度(u32)
+#   页数据  按页表的顺序依次存放每页zlib压缩后的数据，全为0的页不保存
+CHECKPOINT_MAGIC = b'TCK\0'
+CHECKPOINT_VERSION = 1
+CHECKPOINT_HEADER = struct.Struct('<4sHHqqqIII')
+CHECKPOINT_PAGE = struct.Struct('<BqI')
+CHECKPOINT_FLAG_INPUT_EXHAUSTED = 1  # 保存时已没有更多输入
+
+# 默认的检查点间隔(秒)，以及检查点执行时每个时间片的指令数
+CHECKPOINT_INTERVAL = 60
+CHECKPOINT_SLICE_STEPS = 1000000
+
+# 编译时预先执行程序前缀的指令数上限，以及记录结果时纸带和输出各自的长度上限(字节)
+PRESET_STEPS = 1000000
+PRESET_MAX_SIZE = 1 << 16
+# 预先执行时每执行这么多条指令检查一次结果的大小，超过上限时立即放弃
+PRESET_SLICE_STEPS = 10000
+
+# 批量执行时每个时间片的指令数，每片结束时检查时间限制。字节码解释器执行一片约需10毫秒
+BATCH_SLICE_STEPS = 100000
+
+# 批量执行时每个工作进程最多排队的任务数，输入按需读取，不一次全部提交
+BATCH_QUEUE_PER_WORKER = 2
+
+# Python后端中只访问一个单元的操作，{q}为单元的下标表达式
+PYTHON_CELL_OPS = {
+    OP_ADD: "tape_b[{q}] = (tape_b[{q}] + {arg}) % 256",
+    OP_OUT: "write(tape_b[{q}])",
+    OP_IN: "tape_b[{q}] = read(tape_b[{q}])",
+    OP_SWAP: "tape_a[{q}], tape_b[{q}] = tape_b[{q}], tape_a[{q}]",
+    OP_LOAD: "tape_b[{q}] = tape_a[{q}]",
+    OP_STORE: "tape_a[{q}] = tape_b[{q}]",
+    OP_ADDA: "tape_b[{q}] = (tape_b[{q}] + tape_a[{q}]) % 256",
+    OP_SUBA: "tape_b[{q}] = (tape_b[{q}] - tape_a[{q}]) % 256",
+    OP_MULA: "tape_b[{q}] = (tape_b[{q}] * tape_a[{q}]) % 256",
+    OP_DIVA: "if tape_a[{q}]: tape_b[{q}] = tape_b[{q}] // tape_a[{q}]",
+    OP_XORA: "tape_b[{q}] ^= tape_a[{q}]",
+}
+
+# 有效的指令字符
+INSTRUCTION_PATTERN = re.compile(r'[><+\-.,\[\]!@#$%^&*]')
+
+# 按步长扫描时每次查找的窗口大小
+SCAN_WINDOW = 4096
+
+# Python后端允许的最大循环嵌套深度，超过时退回字节码解释器
+PYTHON_MAX_LOOP_DEPTH = 16
+
+# Python后端生成的源码行数上限。更长的函数编译很慢、占用大量内存，执行也不比字节码解释器快，
+# 超过时退回字节码解释器
+PYTHON_MAX_LINES = 16384
+
+# 分层执行时每个时间片的指令数。时间片在循环跳回处结束，一个循环在这么多个时间片结束时
+# 正在执行，就编译为Python函数
+TIER_SLICE_STEPS = 10000
+TIER_THRESHOLD = 3
+
+# 同一进程中缓存的循环函数个数
+TIER_CACHE_SIZE = 256
+
+# 分层执行时编译的循环最多包含的指令数。更大的循环生成和编译源码的开销超过收益，
+# 留在解释器中执行，其中的内层循环仍可单独编译
+TIER_MAX_OPS = 8192
+
+def python_offset(off):
+    """Python后端中指针偏移off处单元的下标表达式"""
+    if off > 0:
+        return f"p + {off}"
+    if off < 0:
+        return f"p - {-off}"
+    return "p"
+
+@functools.lru_cache(maxsize=TIER_CACHE_SIZE)
+def compile_loop_source(source):
+    """编译分层执行生成的循环函数。同一进程中再次执行同一循环时直接复用"""
+    namespace = {}
+    exec(compile(source, "<turing-loop>", "exec"), namespace)
+    return namespace["t_program"]
+
+def affine_power(m, c, n):
+    """计算仿射变换 b -> m*b + c 重复n次后的系数(模256)"""
+    result_m, result_c = 1, 0
+    while n:
+        if n & 1:
+            result_m, result_c = (m * result_m) % 256, (m * result_c + c) % 256
+        m, c = (m * m) % 256, (m * c + c) % 256
+        n >>= 1
+    return result_m, result_c
+
+class OutputSink:
+    """程序输出的缓冲区，按字节收集输出并批量写出
+
+    target 为None时写到标准输出，也可以是任意可写的二进制流或接收bytes的回调函数。
+    缓冲区达到buffer_size、行缓冲模式下遇到换行，或执行结束时写出。
+    """
+
+    def __init__(self, target=None, buffer_size=8192, line_buffered=None):
+        self.target = target
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        if line_buffered is None:
+            # 输出到终端时按行写出，便于交互
+            stream = sys.stdout if target is None else target
+            isatty = getattr(stream, 'isatty', None)
+            line_buffered = bool(isatty and isatty())
+        self.line_buffered = line_buffered
+        self.record = None  # 不为None时，写出的内容同时追加到这里，见start_recording
+        self.record_limit = 0
+
+    def start_recording(self, limit):
+        """开始记录写出的全部内容，超过limit字节后放弃记录"""
+        self.record = bytearray()
+        self.record_limit = limit
+
+    def stop_recording(self):
+        """停止记录，返回记录的内容，超过上限时返回None"""
+        self.flush()
+        record = self.record
+        self.record = None
+        return record
+
+    def write_byte(self, value):
+        """写入一个字节"""
+        self.buffer.append(value)
+        if len(self.buffer) >= self.buffer_size or (value == 10 and self.line_buffered):
+            self.flush()
+
+    def write(self, data):
+        """写入一段字节"""
+        self.buffer += data
+        if len(self.buffer) >= self.buffer_size or (self.line_buffered and 10 in data):
+            self.flush()
+
+    def flush(self):
+        """将缓冲区中的内容写到目标"""
+        if not self.buffer:
+            return
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        if self.record is not None:
+            self.record += data
+            if len(self.record) > self.record_limit:
+                self.record = None
+
+        target = self.target
+        if target is None:
+            # 先刷新文本层，保证与print输出的先后顺序
+            stream = sys.stdout
+            stream.flush()
+            binary = getattr(stream, 'buffer', None)
+            if binary is not None:
+                binary.write(data)
+                binary.flush()
+            else:
+                # 标准输出被替换为文本流(如StringIO)时，按字节值逐个转为字符
+                stream.write(data.decode('latin-1'))
+        elif hasattr(target, 'write'):
+            target.write(data)
+            if hasattr(target, 'flush'):
+                target.flush()
+        else:
+            target(data)
+
+class InputSource:
+    """程序输入，按块读取并逐字节提供给 , 指令
+
+    source 为None时读取标准输入，也可以是bytes、bytearray、mmap等缓冲区对象，或可读的文件对象。
+    eof 指定读到结尾后的行为: '0' 存入0, 'unchanged' 保持原值, '-1' 存入255。
+    """
+
+    def __init__(self, source=None, eof='0', chunk_size=65536):
+        if eof not in EOF_MODES:
+            raise ValueError(f"未知的EOF处理方式: {eof}")
+        self.source = source
+        self.eof = eof
+        self.chunk_size = chunk_size
+        self.buffer = b''
+        self.position = 0
+        self.exhausted = False
+        self.before_fill = None  # 读取新一块输入(可能阻塞)之前调用，例如写出已有的输出
+        if source is not None and not hasattr(source, 'read1') and not hasattr(source, 'readinto'):
+            try:
+                # 缓冲区对象(包括mmap)直接按内存视图读取，不复制
+                self.buffer = memoryview(source).cast('B')
+                self.exhausted = True
+            except TypeError:
+                pass
+
+    def read_value(self, current):
+        """读取一个字节作为新的单元值，current为单元的当前值"""
+        if self.position >= len(self.buffer) and not self.fill():
+            if self.eof == '0':
+                return 0
+            if self.eof == '-1':
+                return 255
+            return current
+        value = self.buffer[self.position]
+        self.position += 1
+        return value
+
+    def fill(self):
+        """读取下一块输入，没有更多输入时返回False"""
+        if self.exhausted:
+            return False
+        if self.before_fill is not None:
+            self.before_fill()
+        stream = self.source
+        if stream is None:
+            stream = getattr(sys.stdin, 'buffer', sys.stdin)
+        # read1 只返回已经可用的数据，交互输入时不会等待凑满一整块
+        read = getattr(stream, 'read1', stream.read)
+        data = read(self.chunk_size)
+        if not data:
+            self.exhausted = True
+            return False
+        if isinstance(data, str):
+            # 文本流(如被替换的sys.stdin)按字符编码取模256
+            data = bytes(ord(char) % 256 for char in data)
+        self.buffer = data
+        self.position = 0
+        return True
+
+    def pending(self):
+        """返回已读入缓冲区但还未被程序读取的输入，以及是否已没有更多输入"""
+        return bytes(self.buffer[self.position:]), self.exhausted
+
+    def restore(self, pending, exhausted):
+        """将检查点中保存的待读输入放到缓冲区最前面，读完后再读取source"""
+        self.buffer = pending + bytes(self.buffer[self.position:])
+        self.position = 0
+        if exhausted and self.source is None:
+            # 保存时输入已经读完，没有指定新的输入时不再读取标准输入
+            self.exhausted = True
+
+class ProgramCache:
+    """编译结果的磁盘缓存
+
+    以清理后的代码、解释器版本和优化级别的哈希为键，每个程序保存为一个文件。
+    命中时更新文件的修改时间，总大小超过max_size时按修改时间删除最久未使用的文件。
+    缓存只是加速手段，读写失败时当作未命中处理。
+    """
+
+    suffix = '.tpc'
+
+    def __init__(self, directory=CACHE_DIR, max_size=CACHE_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    def key(self, code, optimize_level, preset=True):
+        """计算代码对应的缓存键，preset 表示编译结果是否包含预先执行的程序前缀"""
+        digest = hashlib.sha256()
+        digest.update(f"{INTERPRETER_VERSION}\0{optimize_level}\0{int(preset)}\0".encode())
+        digest.update(code.encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def load(self, key):
+        """读取缓存的指令列表，未命中时返回None"""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                program = marshal.load(f)
+            os.utime(path)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return program if isinstance(program, list) else None
+
+    def store(self, key, program):
+        """保存指令列表。先写入临时文件再改名，并发的进程不会读到写了一半的文件"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    marshal.dump(program, f)
+                os.replace(temp_path, self.path(key))
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            self.evict()
+        except OSError:
+            pass
+
+    def evict(self):
+        """删除最久未使用的缓存文件，直到总大小不超过上限"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(self.suffix):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """删除所有缓存文件"""
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(self.suffix):
+                        os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+
+class ResultCache(ProgramCache):
+    """不读取输入的程序的执行结果缓存
+
+    这类程序每次执行的输出和最终状态都相同。以清理后的代码和解释器版本的哈希为键，
+    保存程序的全部输出和执行结束时的纸带与指针，再次执行时直接输出缓存的内容。
+    与编译缓存放在同一目录，按同样的方式淘汰最久未使用的文件。
+    """
+
+    suffix = '.tro'
+
+    def __init__(self, directory=CACHE_DIR, max_size=RESULT_CACHE_MAX_SIZE):
+        super().__init__(directory, max_size)
+
+    def key(self, code):
+        """计算代码对应的缓存键"""
+        digest = hashlib.sha256()
+        digest.update(f"{INTERPRETER_VERSION}\0result\0".encode())
+        digest.update(code.encode())
+        return digest.hexdigest()
+
+    def replay(self, key, interpreter):
+        """命中时输出缓存的内容，并将纸带和指针设为执行结束时的状态，返回是否命中"""
+        path = self.path(key)
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return False
+        with f:
+            header = f.read(RESULT_HEADER.size)
+            if len(header) != RESULT_HEADER.size:
+                return False
+            magic, version, _, pointer, size_a, size_b, size_output = RESULT_HEADER.unpack(header)
+            if (magic != RESULT_MAGIC or version != RESULT_VERSION
+                    or os.fstat(f.fileno()).st_size != RESULT_HEADER.size + size_a + size_b + size_output):
+                return False
+            tape_a = f.read(size_a)
+            tape_b = f.read(size_b)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            # 长度已经核对过，之后的输出边读边写。开始输出后不能再当作未命中，读取出错时直接报错
+            while size_output:
+                chunk = f.read(min(size_output, RESULT_CHUNK_SIZE))
+                interpreter.output.write(chunk)
+                size_output -= len(chunk)
+        size = max(TAPE_MIN_SIZE, len(tape_a), len(tape_b), pointer + 1)
+        interpreter.tape_a = bytearray(tape_a.ljust(size, b'\0'))
+        interpreter.tape_b = bytearray(tape_b.ljust(size, b'\0'))
+        interpreter.pointer = pointer
+        return True
+
+    def store(self, key, interpreter, output):
+        """保存执行结束时的输出和状态，结果超过大小上限时不保存"""
+        tape_a = bytes(interpreter.tape_a).rstrip(b'\0')
+        tape_b = bytes(interpreter.tape_b).rstrip(b'\0')
+        if len(tape_a) + len(tape_b) + len(output) > self.max_size:
+            return
+        header = RESULT_HEADER.pack(RESULT_MAGIC, RESULT_VERSION, 0, interpreter.pointer,
+                                    len(tape_a), len(tape_b), len(output))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write_file_atomic(self.path(key), [header, tape_a, tape_b, output])
+            self.evict()
+        except OSError:
+            pass
+
+def write_file_atomic(path, chunks):
+    """将chunks依次写入path。先写临时文件再改名，正在读取或映射旧文件的进程不受影响"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def encode_bytecode(program, flags=0):
+    """将指令列表编码为.tbc格式的bytes"""
+    ops = bytearray()
+    args = []
+    constants = []
+    for op, arg in program:
+        ops.append(op)
+        if op == OP_MULADD:
+            low, high, inverse, adds, others = arg
+            args.append(len(constants))
+            constants += [low, high, inverse, len(adds)]
+            for off, n in adds:
+                constants += [off, n]
+            constants.append(len(others))
+            for off, cell_ops in others:
+                constants += [off, len(cell_ops)]
+                for cell_op, cell_arg in cell_ops:
+                    constants += [cell_op, cell_arg or 0]
+        elif op == OP_BLOCK:
+            low, high, shift, skip, adds, cells = arg
+            args.append(len(constants))
+            constants += [low, high, shift, skip, len(adds)]
+            for off, n in adds:
+                constants += [off, n]
+            constants.append(len(cells))
+            for off, cell_op, cell_arg in cells:
+                constants += [off, cell_op, cell_arg or 0]
+        elif op == OP_PRESET:
+            target, pointer, tape_a, tape_b, output = arg
+            data = tape_a + tape_b + output
+            data += bytes(-len(data) % 4)
+            args.append(len(constants))
+            constants += [target, pointer, len(tape_a), len(tape_b), len(output)]
+            constants += struct.unpack(f'<{len(data) // 4}i', data)
+        elif arg is None:
+            args.append(-1 if op in (OP_JZ, OP_JNZ) else 0)
+        else:
+            args.append(arg)
+    ops += bytes(-len(ops) % 4)
+    header = TBC_HEADER.pack(TBC_MAGIC, TBC_VERSION, flags, len(program), len(constants))
+    return (header + bytes(ops)
+            + struct.pack(f'<{len(args)}i', *args)
+            + struct.pack(f'<{len(constants)}i', *constants))
+
+class BytecodeProgram:
+    """通过mmap加载的.tbc文件，作为只读的指令序列直接交给解释器执行
+
+    指令在访问时才从映射的内存中解码，加载的开销与程序大小无关，
+    多个进程执行同一个文件时共享同一份页面缓存。
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"不是有效的T字节码文件: {path}") from None
+        try:
+            self.open_sections(path)
+        except ValueError:
+            self.map.close()
+            raise
+        self.constant_cache = {}
+
+    @classmethod
+    def from_bytes(cls, data, name='<内存>'):
+        """从内存中的.tbc数据创建，例如检查点中保存的程序。数据复制到一块匿名映射中"""
+        if len(data) < TBC_HEADER.size:
+            raise ValueError(f"不是有效的T字节码文件: {name}")
+        program = cls.__new__(cls)
+        program.map = mmap.mmap(-1, len(data))
+        program.map.write(data)
+        try:
+            program.open_sections(name)
+        except ValueError:
+            program.map.close()
+            raise
+        program.constant_cache = {}
+        return program
+
+    def open_sections(self, path):
+        # 各区域的视图引用的是mmap本身，解析完后可以释放整个文件的视图
+        with memoryview(self.map) as data:
+            self.parse_sections(path, data)
+
+    def parse_sections(self, path, data):
+        if len(data) < TBC_HEADER.size:
+            raise ValueError(f"不是有效的T字节码文件: {path}")
+        magic, version, self.flags, count, constant_count = TBC_HEADER.unpack_from(data)
+        if magic != TBC_MAGIC:
+            raise ValueError(f"不是有效的T字节码文件: {path}")
+        if not 1 <= version <= TBC_VERSION:
+            raise ValueError(f"不支持的T字节码版本: {version}")
+        start = TBC_HEADER.size
+        args_start = start + count + (-count % 4)
+        constants_start = args_start + 4 * count
+        if len(data) != constants_start + 4 * constant_count:
+            raise ValueError(f"T字节码文件长度不正确: {path}")
+        self.ops = data[start:start + count]
+        self.args = self.int_view(data[args_start:constants_start])
+        self.constants = self.int_view(data[constants_start:])
+
+    @staticmethod
+    def int_view(data):
+        """将小端序的i32区域转为可按下标读取的序列，小端机器上不复制"""
+        if sys.byteorder == 'little' and struct.calcsize('i') == 4:
+            return data.cast('i')
+        return struct.unpack(f'<{len(data) // 4}i', data)
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __getitem__(self, index):
+        op = self.ops[index]
+        arg = self.args[index]
+        if op == OP_MULADD:
+            return op, self.decode_muladd(arg)
+        if op == OP_BLOCK:
+            return op, self.decode_block(arg)
+        if op == OP_PRESET:
+            return op, self.decode_preset(arg)
+        if op in (OP_JZ, OP_JNZ):
+            return op, (arg if arg >= 0 else None)
+        if op in (OP_ADD, OP_MOVE, OP_SCAN, OP_BREAK):
+            return op, arg
+        return op, None
+
+    def decode_muladd(self, index):
+        """从常量区解码乘加循环的参数，解码结果会被缓存"""
+        cached = self.constant_cache.get(index)
+        if cached is not None:
+            return cached
+        c = self.constants
+        low, high, inverse, add_count = c[index:index + 4]
+        i = index + 4
+        adds = []
+        for _ in range(add_count):
+            adds.append((c[i], c[i + 1]))
+            i += 2
+        others = []
+        other_count = c[i]
+        i += 1
+        for _ in range(other_count):
+            off, op_count = c[i], c[i + 1]
+            i += 2
+            cell_ops = []
+            for _ in range(op_count):
+                cell_op, cell_arg = c[i], c[i + 1]
+                cell_ops.append((cell_op, cell_arg if cell_op == OP_ADD else None))
+                i += 2
+            others.append((off, tuple(cell_ops)))
+        cached = self.constant_cache[index] = (low, high, inverse, tuple(adds), tuple(others))
+        return cached
+
+    def decode_block(self, index):
+        """从常量区解码OP_BLOCK的参数，解码结果会被缓存"""
+        cached = self.constant_cache.get(index)
+        if cached is not None:
+            return cached
+        c = self.constants
+        low, high, shift, skip, add_count = c[index:index + 5]
+        i = index + 5
+        adds = []
+        for _ in range(add_count):
+            adds.append((c[i], c[i + 1]))
+            i += 2
+        cells = []
+        cell_count = c[i]
+        i += 1
+        for _ in range(cell_count):
+            off, cell_op, cell_arg = c[i:i + 3]
+            cells.append((off, cell_op, cell_arg if cell_op == OP_ADD else None))
+            i += 3
+        cached = self.constant_cache[index] = (low, high, shift, skip, tuple(adds), tuple(cells))
+        return cached
+
+    def decode_preset(self, index):
+        """从常量区解码OP_PRESET的参数"""
+        c = self.constants
+        target, pointer, size_a, size_b, size_output = c[index:index + 5]
+        words = (size_a + size_b + size_output + 3) // 4
+        data = struct.pack(f'<{words}i', *c[index + 5:index + 5 + words])
+        return (target, pointer, data[:size_a], data[size_a:size_a + size_b],
+                data[size_a + size_b:size_a + size_b + size_output])
+
+    def close(self):
+        self.ops.release()
+        if isinstance(self.args, memoryview):
+            self.args.release()
+            self.constants.release()
+        self.map.close()
+
+class PagedTape:
+    """按页稀疏存储的纸带，提供解释器用到的bytearray接口
+
+    纸带按PAGE_SIZE个单元分页，页在第一次写入非0值时才分配，未分配的页读出全为0。
+    长度只是逻辑上的，扩展纸带不分配内存。
+    """
+
+    def __init__(self, data=b'', length=0):
+        self.pages = {}
+        self.length = max(length, len(data))
+        for start in range(0, len(data), PAGE_SIZE):
+            chunk = data[start:start + PAGE_SIZE]
+            if chunk.count(0) != len(chunk):
+                page = bytearray(PAGE_SIZE)
+                page[:len(chunk)] = chunk
+                self.pages[start >> PAGE_BITS] = page
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.get_slice(index)
+        page = self.pages.get(index >> PAGE_BITS)
+        return page[index & PAGE_MASK] if page is not None else 0
+
+    def __setitem__(self, index, value):
+        page = self.pages.get(index >> PAGE_BITS)
+        if page is None:
+            if not value:
+                return
+            page = self.pages[index >> PAGE_BITS] = bytearray(PAGE_SIZE)
+        page[index & PAGE_MASK] = value
+
+    def __delitem__(self, index):
+        """只支持 del tape[n:]，截短纸带"""
+        start = index.start
+        for number in [number for number in self.pages if number << PAGE_BITS >= start]:
+            del self.pages[number]
+        page = self.pages.get(start >> PAGE_BITS)
+        if page is not None:
+            offset = start & PAGE_MASK
+            page[offset:] = bytes(PAGE_SIZE - offset)
+        self.length = min(self.length, start)
+
+    def resize(self, length):
+        """将纸带扩展到length，新增的单元为0"""
+        self.length = max(self.length, length)
+
+    def get_slice(self, index):
+        indices = range(*index.indices(self.length))
+        if not indices:
+            return bytearray()
+        step = indices.step
+        if step < 0:
+            # 反向切片由对应的正向切片反转得到
+            result = self.get_slice(slice(indices[-1], indices[0] + 1, -step))
+            result.reverse()
+            return result
+        if step >= PAGE_SIZE:
+            # 步长跨页时每页最多取一个单元，逐个读取比逐页遍历快
+            return bytearray(self[i] for i in indices)
+        result = bytearray()
+        i, stop = indices.start, indices.stop
+        while i < stop:
+            number = i >> PAGE_BITS
+            base = number << PAGE_BITS
+            page_stop = min(stop, base + PAGE_SIZE)
+            page = self.pages.get(number)
+            if page is None:
+                result += bytes(len(range(i, page_stop, step)))
+            else:
+                result += page[i - base:page_stop - base:step]
+            i += len(range(i, page_stop, step)) * step
+        return result
+
+    def find(self, value, start=0, end=None):
+        end = self.length if end is None else min(end, self.length)
+        i = start
+        while i < end:
+            number = i >> PAGE_BITS
+            base = number << PAGE_BITS
+            page = self.pages.get(number)
+            if page is None:
+                if value == 0:
+                    return i
+            else:
+                found = page.find(value, i - base, end - base)
+                if found >= 0:
+                    return base + found
+            i = base + PAGE_SIZE
+        return -1
+
+    def rfind(self, value, start=0, end=None):
+        end = self.length if end is None else min(end, self.length)
+        i = end - 1
+        while i >= start:
+            number = i >> PAGE_BITS
+            base = number << PAGE_BITS
+            page = self.pages.get(number)
+            if page is None:
+                if value == 0:
+                    return i
+            else:
+                found = page.rfind(value, max(start - base, 0), i - base + 1)
+                if found >= 0:
+                    return base + found
+            i = base - 1
+        return -1
+
+    def count(self, value, start=0, end=None):
+        """只支持统计0的个数"""
+        end = self.length if end is None else min(end, self.length)
+        nonzero = 0
+        for number, page in self.pages.items():
+            base = number << PAGE_BITS
+            low, high = max(start, base), min(end, base + PAGE_SIZE)
+            if low < high:
+                nonzero += high - low - page.count(0, low - base, high - base)
+        return max(end - start, 0) - nonzero
+
+def tape_pages(tape):
+    """按PAGE_SIZE分页遍历纸带中不全为0的页，返回 (页号, 页数据)，最后一页可能不满一页"""
+    if isinstance(tape, PagedTape):
+        for number, page in sorted(tape.pages.items()):
+            if page.count(0) != PAGE_SIZE:
+                yield number, page
+        return
+    for start in range(0, len(tape), PAGE_SIZE):
+        page = tape[start:start + PAGE_SIZE]
+        if page.count(0) != len(page):
+            yield start >> PAGE_BITS, page
+
+class TraceRecorder:
+    """逐步执行的轨迹，在预先分配的环形缓冲区中保存最近size步的记录
+
+    每步记录指令位置、数据指针以及该位置纸带A和纸带B的值。sample_every 大于0时，
+    每执行这么多步额外显示一次完整状态(show_state)。
+    """
+
+    def __init__(self, size=1000, sample_every=0):
+        self.size = size
+        self.sample_every = sample_every
+        self.ips = array('q', bytes(8 * size))
+        self.pointers = array('q', bytes(8 * size))
+        self.values_a = bytearray(size)
+        self.values_b = bytearray(size)
+        self.steps = 0  # 已记录的总步数
+
+    def record(self, ip, pointer, a, b):
+        """记录一步，缓冲区满后覆盖最早的记录"""
+        index = self.steps % self.size
+        self.ips[index] = ip
+        self.pointers[index] = pointer
+        self.values_a[index] = a
+        self.values_b[index] = b
+        self.steps += 1
+
+    def clear(self):
+        self.steps = 0
+
+    def records(self):
+        """按从早到晚的顺序返回保留的记录 (步数, 指令位置, 指针, 纸带A值, 纸带B值)"""
+        first = max(0, self.steps - self.size)
+        return [(step, self.ips[step % self.size], self.pointers[step % self.size],
+                 self.values_a[step % self.size], self.values_b[step % self.size])
+                for step in range(first, self.steps)]
+
+    def dump(self, code, file=None):
+        """输出保留的记录，code为执行的(预处理后的)代码，用于显示每步的指令"""
+        file = sys.stdout if file is None else file
+        records = self.records()
+        print(f"最近 {len(records)} 步 (共 {self.steps} 步):", file=file)
+        for step, ip, pointer, a, b in records:
+            cmd = code[ip] if 0 <= ip < len(code) else ' '
+            print(f"{step:>10}  指令 {ip:>8} '{cmd}'  指针 {pointer:>8}  A={a:<3} B={b:<3}", file=file)
+
+class Profiler:
+    """执行计数，记录每个源码位置的执行次数和每对 [ ] 的进入次数与迭代次数
+
+    设置 TuringInterpreter.profiler 后，execute 改为执行只折叠连续指令、带计数的程序，
+    计数结果反映源码本身的执行情况，不受循环优化的影响。未设置时不产生任何开销。
+    """
+
+    def __init__(self):
+        self.source = ""         # 原始代码，包括注释
+        self.code = ""           # 预处理后的代码
+        self.offsets = []        # 预处理后每个字符在原始代码中的位置
+        self.counts = []         # 预处理后每个字符的执行次数
+        self.loops = []          # (开始位置, 结束位置, 进入次数, 迭代次数)，位置为预处理后的下标
+
+    def start(self, source, code):
+        """开始分析一次执行，source为原始代码，code为预处理后的代码"""
+        self.source = source
+        self.code = code
+        self.offsets = [match.start() for match in re.finditer(INSTRUCTION_PATTERN, source)]
+        self.counts = [0] * len(code)
+        self.loops = []
+
+    def finish(self, segments, segment_counts, brackets):
+        """根据每个指令段的执行次数计算各位置和各循环的计数"""
+        counts = self.counts
+        for (start, end), count in zip(segments, segment_counts):
+            if count:
+                counts[start:end] = [count] * (end - start)
+        for start in sorted(brackets):
+            end = brackets[start]
+            if start < end:
+                # 进入次数即 [ 的执行次数，迭代次数即 [ 之后第一个字符的执行次数
+                iterations = counts[start + 1]
+                self.loops.append((start, end, counts[start], iterations))
+
+    def total(self):
+        """执行的源指令总数"""
+        return sum(self.counts)
+
+    def location(self, index):
+        """预处理后下标对应的原始代码行号和列号(从1开始)"""
+        offset = self.offsets[index]
+        line = self.source.count('\n', 0, offset) + 1
+        column = offset - self.source.rfind('\n', 0, offset)
+        return line, column
+
+    def excerpt(self, start, end, width=60):
+        """原始代码中一个循环的摘录，过长时截断"""
+        text = self.source[self.offsets[start]:self.offsets[end] + 1]
+        text = ' '.join(text.split())
+        return text if len(text) <= width else text[:width - 3] + '...'
+
+    def hot_loops(self, limit=10):
+        """按循环内执行的指令数从多到少返回 (指令数, 开始, 结束, 进入次数, 迭代次数)"""
+        loops = [(sum(self.counts[start:end + 1]), start, end, entries, iterations)
+                 for start, end, entries, iterations in self.loops]
+        loops.sort(reverse=True)
+        return loops[:limit]
+
+    def report(self, limit=10):
+        """生成热点循环的文字报告"""
+        total = self.total()
+        lines = [f"共执行 {total} 条指令"]
+        if not self.loops:
+            return lines[0]
+        lines.append(f"最热的 {min(limit, len(self.loops))} 个循环:")
+        lines.append(f"{'指令数':>14} {'占比':>6} {'进入':>10} {'迭代':>12}  位置      代码")
+        for executed, start, end, entries, iterations in self.hot_loops(limit):
+            line, column = self.location(start)
+            share = executed / total * 100 if total else 0.0
+            lines.append(f"{executed:>14} {share:>5.1f}% {entries:>10} {iterations:>12}  "
+                         f"{f'{line}:{column}':<9} {self.excerpt(start, end)}")
+        return "\n".join(lines)
+
+class TierStats:
+    """分层执行的统计: 编译了哪些循环，以及解释执行、编译和执行编译后的循环各用的时间
+
+    backend 为 'tiered' 时由 TuringInterpreter.run_tiered 填写。从源码执行时，
+    报告中给出循环在原始代码中的行号、列号和摘录，从.tbc文件执行时给出指令下标。
+    """
+
+    def __init__(self, source="", code=""):
+        self.source = source     # 原始代码，包括注释
+        self.code = code         # 预处理后的代码
+        self.offsets = [match.start() for match in re.finditer(INSTRUCTION_PATTERN, source)]
+        self.loops = {}          # 循环开头的指令下标 -> [源码中 [ 的位置或None, 编译用时, 进入次数, 执行用时]
+        self.rejected = {}       # 变热但没有编译的循环: 指令下标 -> (源码中 [ 的位置或None, 指令数)
+        self.total_time = 0.0
+        self.compile_time = 0.0
+
+    def add_loop(self, index, position, compile_time):
+        """记录一个编译好的循环，position 为它在预处理后代码中的位置，未知时为None"""
+        self.loops[index] = [position, compile_time, 0, 0.0]
+        self.compile_time += compile_time
+
+    def reject_loop(self, index, position, size):
+        """记录一个变热但因过大或嵌套过深而没有编译的循环，size 为它包含的指令数"""
+        self.rejected[index] = (position, size)
+
+    def loop_time(self):
+        """执行编译后的循环所用的总时间"""
+        return sum(loop[3] for loop in self.loops.values())
+
+    def describe(self, index, position):
+        """循环的位置和代码摘录"""
+        if position is None or position >= len(self.offsets):
+            return f"指令 {index}"
+        offset = self.offsets[position]
+        line = self.source.count('\n', 0, offset) + 1
+        column = offset - self.source.rfind('\n', 0, offset)
+        end = offset
+        depth = 0
+        # 找到匹配的 ]，摘录整个循环
+        for end in range(position, len(self.code)):
+            depth += (self.code[end] == '[') - (self.code[end] == ']')
+            if depth == 0:
+                break
+        text = ' '.join(self.source[offset:self.offsets[end] + 1].split())
+        if len(text) > 60:
+            text = text[:57] + '...'
+        return f"{f'{line}:{column}':<9} {text}"
+
+    def report(self):
+        """生成文字报告"""
+        loop_time = self.loop_time()
+        interpreted = max(0.0, self.total_time - self.compile_time - loop_time)
+        lines = [f"分层执行共 {self.total_time:.3f} 秒: 解释执行 {interpreted:.3f} 秒，"
+                 f"编译 {self.compile_time:.3f} 秒，执行编译后的循环 {loop_time:.3f} 秒"]
+        if not self.loops:
+            lines.append("没有循环被编译")
+        else:
+            lines.append(f"编译了 {len(self.loops)} 个循环:")
+            lines.append(f"{'进入':>10} {'用时(秒)':>10} {'编译(毫秒)':>10}  位置      代码")
+            for index, (position, compile_time, entries, elapsed) in sorted(self.loops.items()):
+                lines.append(f"{entries:>10} {elapsed:>10.3f} {compile_time * 1000:>10.2f}  "
+                             f"{self.describe(index, position)}")
+        if self.rejected:
+            lines.append(f"{len(self.rejected)} 个热循环过大或嵌套过深，留在解释器中执行:")
+            lines.append(f"{'指令数':>10}  位置      代码")
+            for index, (position, size) in sorted(self.rejected.items()):
+                lines.append(f"{size:>10}  {self.describe(index, position)}")
+        return "\n".join(lines)
+
 class TuringInterpreter:
     def __init__(self):
-        # 初始化两个纸带，默认长度500
-        self.tape_a = [0] * 500  # 指令纸带
-        self.tape_b = [0] * 500  # 数据纸带
+        # 初始化两个纸带，默认长度500，每个单元一个字节
+        self.tape_a = bytearray(TAPE_MIN_SIZE)  # 指令纸带
+        self.tape_b = bytearray(TAPE_MIN_SIZE)  # 数据纸带
         self.pointer = 0         # 当前指针位置
         self.instruction_ptr = 0 # 当前执行指令的位置
         self.code = ""           # 原始代码
@@ -14,13 +1033,25 @@ class TuringInterpreter:
         self.debug_mode = False
         self.verbose_mode = False
         self.step_mode = False
-        
+        self.optimize_level = 1  # 0: 只折叠连续指令, 1: 识别常见循环模式，按偏移合并指针移动
+        self.backend = 'bytecode'  # 'bytecode' 字节码解释器, 'python' Python源码生成, 'tiered' 分层执行
+        self.output = OutputSink()  # 程序输出
+        self.input = InputSource()   # 程序输入
+        self.input.before_fill = self.flush_output
+        self.cache = None  # 编译缓存(ProgramCache)，None时每次重新编译
+        self.profiler = None  # 执行计数(Profiler)，None时不计数
+        self.trace = TraceRecorder()  # 调试和详细模式下的执行轨迹
+        self.checkpoint = None  # 检查点文件路径，None时不保存检查点
+        self.checkpoint_interval = CHECKPOINT_INTERVAL  # 保存检查点的间隔(秒)
+        self.tier_stats = None  # 最近一次分层执行的统计(TierStats)
+        self.tier_functions = {}  # 分层执行中循环开头的指令下标 -> 编译好的循环函数
+
     def preprocess_code(self, code):
         """预处理代码，去除注释和无效字符"""
         # 只保留有效指令字符
-        cleaned_code = re.sub(r'[^><+\-.,\[\]!@#$%^&*]', '', code)
+        cleaned_code = ''.join(INSTRUCTION_PATTERN.findall(code))
         return cleaned_code
-    
+
     def match_brackets(self, code):
         """匹配循环括号，建立跳转表"""
         stack = []
@@ -34,107 +1065,1174 @@ class TuringInterpreter:
                     brackets[start] = pos
                     brackets[pos] = start
         return brackets
-    
+
+    def compile_code(self, code):
+        """将预处理后的代码编译为折叠后的指令列表"""
+        return self.link_jumps(self.fold_code(code))
+
+    def fold_code(self, code):
+        """将预处理后的代码折叠为指令列表，不填写跳转目标"""
+        program = []
+        for match in TOKEN_PATTERN.finditer(code):
+            instruction = self.fold_token(match.group())
+            if instruction is not None:
+                program.append(instruction)
+        return program
+
+    def compile_with_breaks(self, code, positions):
+        """编译预处理后的代码，在positions中每个位置的指令之前插入OP_BREAK
+
+        代码在断点处切开后分段折叠，其余部分与普通编译的结果相同，也照常识别循环模式，
+        只有包含断点的循环不会被整体替换。返回 (指令列表, {位置: 该位置的OP_BREAK的下标})。
+        """
+        program = []
+        start = 0
+        for position in sorted(positions):
+            program += self.fold_code(code[start:position])
+            program.append((OP_BREAK, position))
+            start = position
+        program += self.fold_code(code[start:])
+        program = self.link_jumps(program)
+        if self.optimize_level >= 1:
+            program = self.optimize_offsets(self.optimize_loops(program))
+        breaks = {arg: index for index, (op, arg) in enumerate(program) if op == OP_BREAK}
+        return program, breaks
+
+    def fold_token(self, token):
+        """将一段连续的同类指令转为一条指令，没有效果时返回None"""
+        cmd = token[0]
+        if cmd in '+-':
+            n = (token.count('+') - token.count('-')) % 256
+            return (OP_ADD, n) if n else None
+        if cmd == '>':
+            return (OP_MOVE, len(token))
+        if cmd == '<':
+            # 左移不与右移合并: 指针越过0时会取绝对值，混合移动无法用净位移表示
+            return (OP_MOVE, -len(token))
+        if cmd == '[':
+            return (OP_JZ, None)
+        if cmd == ']':
+            return (OP_JNZ, None)
+        return (SIMPLE_OPS[cmd], None)
+
+    def link_jumps(self, program):
+        """为指令列表中的循环指令填写跳转目标"""
+        stack = []
+        for pos, (op, arg) in enumerate(program):
+            if op == OP_JZ:
+                stack.append(pos)
+                program[pos] = (OP_JZ, None)
+            elif op == OP_JNZ:
+                if stack:
+                    start = stack.pop()
+                    # 跳转目标直接指向匹配括号的下一条指令
+                    program[start] = (OP_JZ, pos + 1)
+                    program[pos] = (OP_JNZ, start + 1)
+                else:
+                    program[pos] = (OP_JNZ, None)
+        return program
+
+    def optimize_loops(self, program):
+        """识别常见的循环模式，在循环前插入等价的单条指令
+
+        插入的指令在前提条件不满足时(例如指针会越过0)直接落到原循环上继续执行，
+        满足时完成整个循环并跳过它。
+        """
+        optimized = []
+        stack = []
+        for op, arg in program:
+            if op == OP_JZ:
+                stack.append(len(optimized))
+            elif op == OP_JNZ and stack:
+                start = stack.pop()
+                idiom = self.match_loop_idiom(optimized[start + 1:])
+                if idiom:
+                    optimized.insert(start, idiom)
+            optimized.append((op, arg))
+        return self.link_jumps(optimized)
+
+    def match_loop_idiom(self, body):
+        """判断最内层循环体是否为可直接计算的模式，返回替代指令或None"""
+        if len(body) == 1:
+            op, arg = body[0]
+            if op == OP_ADD and arg % 2:
+                return (OP_CLEAR, None)
+            if op == OP_MOVE:
+                return (OP_SCAN, arg)
+
+        offset = low = high = 0
+        cells = {}
+        for op, arg in body:
+            if op == OP_MOVE:
+                offset += arg
+                low = min(low, offset)
+                high = max(high, offset)
+            elif op in LOOP_CELL_OPS:
+                cells.setdefault(offset, []).append((op, arg))
+            else:
+                return None
+        if offset != 0:
+            return None
+
+        # 循环计数单元只能做加减，且每轮的变化量为奇数，循环次数才确定
+        counter = cells.pop(0, [])
+        if any(op != OP_ADD for op, _ in counter):
+            return None
+        delta = sum(arg for _, arg in counter) % 256
+        if delta % 2 == 0:
+            return None
+
+        adds = []
+        others = []
+        for off, ops in sorted(cells.items()):
+            kinds = {op for op, _ in ops}
+            if kinds == {OP_ADD}:
+                n = sum(arg for _, arg in ops) % 256
+                if n:
+                    adds.append((off, n))
+            elif OP_XORA in kinds:
+                # 异或与其他运算不满足交换律，只处理纯异或的单元
+                if kinds != {OP_XORA}:
+                    return None
+                if len(ops) % 2:
+                    others.append((off, ((OP_XORA, None),)))
+            else:
+                others.append((off, tuple(ops)))
+        return (OP_MULADD, (low, high, pow(delta, -1, 256), tuple(adds), tuple(others)))
+
+    def optimize_offsets(self, program):
+        """将不含跳转的一段指针移动和单元操作合并为一条OP_BLOCK，插入在这段指令之前
+
+        OP_BLOCK按相对指针的偏移访问单元，最后一次性移动指针，只检查一次纸带边界。
+        与循环模式一样，指针会越过0时直接落到原指令上逐条执行，否则跳过它们。
+        """
+        optimized = []
+        run = []
+        for instruction in program:
+            if instruction[0] in OFFSET_OPS:
+                run.append(instruction)
+                continue
+            self.append_offset_run(optimized, run)
+            run = []
+            optimized.append(instruction)
+        self.append_offset_run(optimized, run)
+        return self.link_jumps(optimized)
+
+    def append_offset_run(self, optimized, run):
+        """将一段可合并的指令加入optimized，值得合并时在前面加上对应的OP_BLOCK"""
+        if len(run) >= 2 and any(op == OP_MOVE for op, _ in run):
+            optimized.append(self.make_offset_block(run))
+        optimized.extend(run)
+
+    def make_offset_block(self, run):
+        """根据一段可合并的指令生成OP_BLOCK
+
+        只做加减的单元合并为一次加法，其余的操作按原顺序保留。各操作只访问自己的单元，
+        不同单元之间的顺序可以交换，输入输出的相对顺序不变。
+        """
+        offset = low = high = 0
+        entries = []
+        for op, arg in run:
+            if op == OP_MOVE:
+                offset += arg
+                low = min(low, offset)
+                high = max(high, offset)
+            else:
+                entries.append((offset, op, arg))
+
+        other_cells = {off for off, op, _ in entries if op != OP_ADD}
+        adds = {}
+        cells = []
+        for off, op, arg in entries:
+            if off not in other_cells:
+                adds[off] = (adds.get(off, 0) + arg) % 256
+            elif op == OP_ADD and cells and cells[-1][:2] == (off, OP_ADD):
+                cells[-1] = (off, OP_ADD, (cells[-1][2] + arg) % 256)
+            else:
+                cells.append((off, op, arg))
+        adds = tuple((off, n) for off, n in sorted(adds.items()) if n)
+        return (OP_BLOCK, (low, high, offset, len(run), adds, tuple(cells)))
+
+    def evaluate_prefix(self, program):
+        """在编译时执行程序开头不依赖输入的部分，将结果作为OP_PRESET加在指令列表开头
+
+        从全为0的纸带开始执行，直到第一条读取输入的指令、程序结束或执行了约PRESET_STEPS条指令，
+        停下时的状态总是可以从该处继续执行的。OP_PRESET的操作数为
+        (继续执行的位置, 指针, 纸带A, 纸带B, 已产生的输出)，纸带去掉了末尾的0。
+        执行出错或结果太大时不加OP_PRESET，照常从头执行；结果大小按时间片检查，超过上限时立即放弃。
+        """
+        # 读取输入的指令换成断点，停在它之前；末尾的断点表示程序执行完毕
+        trial = []
+        for op, arg in program:
+            if op == OP_IN or (op == OP_BLOCK and any(cell_op == OP_IN for _, cell_op, _ in arg[5])):
+                trial.append((OP_BREAK, None))
+            else:
+                trial.append((op, arg))
+        trial.append((OP_BREAK, None))
+
+        evaluator = TuringInterpreter()
+        output = bytearray()
+        evaluator.set_output(output.extend, line_buffered=False)
+        target = 0
+        steps = 0
+        while steps < PRESET_STEPS:
+            try:
+                evaluator.run_compiled(trial, target, PRESET_SLICE_STEPS)
+            except RuntimeError:
+                # 例如未匹配的括号，留到实际执行时报告
+                return program
+            evaluator.output.flush()
+            target = evaluator.instruction_ptr
+            if len(output) > PRESET_MAX_SIZE or not self.preset_tapes_fit(evaluator):
+                return program
+            if trial[target - 1][0] == OP_BREAK:
+                # 停在读取输入的指令或程序结尾之前
+                target -= 1
+                break
+            # 时间片在循环跳回处结束，之后从该处继续
+            steps += PRESET_SLICE_STEPS
+        if target == 0:
+            return program
+        tape_a = bytes(evaluator.tape_a).rstrip(b'\0')
+        tape_b = bytes(evaluator.tape_b).rstrip(b'\0')
+        preset = (OP_PRESET, (target + 1, evaluator.pointer, tape_a, tape_b, bytes(output)))
+        return self.link_jumps([preset] + program)
+
+    @staticmethod
+    def preset_tapes_fit(evaluator):
+        """预先执行的纸带去掉末尾的0后是否都不超过PRESET_MAX_SIZE"""
+        for tape in (evaluator.tape_a, evaluator.tape_b):
+            if isinstance(tape, PagedTape):
+                return False
+            if len(tape) > PRESET_MAX_SIZE and tape.count(0, PRESET_MAX_SIZE) != len(tape) - PRESET_MAX_SIZE:
+                return False
+        return True
+
+    def apply_preset(self, program):
+        """程序以OP_PRESET开头，且纸带全为0、指针在0处时，将纸带、指针和输出设为其中记录的状态
+
+        返回开始执行的位置: 应用了OP_PRESET时为它记录的位置，否则为1，从头执行原程序。
+        """
+        target, pointer, tape_a, tape_b, output = program[0][1]
+        if (self.pointer != 0 or self.tape_a.count(0) != len(self.tape_a)
+                or self.tape_b.count(0) != len(self.tape_b)):
+            # 例如交互模式中纸带上保留着之前执行的结果
+            return 1
+        size = max(len(self.tape_b), len(tape_a), len(tape_b), pointer + 1)
+        self.tape_a = bytearray(tape_a.ljust(size, b'\0'))
+        self.tape_b = bytearray(tape_b.ljust(size, b'\0'))
+        self.pointer = pointer
+        self.output.write(output)
+        return target
+
+    def apply_offset_cells(self, tape_a, tape_b, p, cells):
+        """依次执行OP_BLOCK中除加法单元之外的操作"""
+        for off, op, arg in cells:
+            q = p + off
+            if op == OP_ADD:
+                tape_b[q] = (tape_b[q] + arg) % 256
+            elif op == OP_OUT:
+                self.output.write_byte(tape_b[q])
+            elif op == OP_IN:
+                tape_b[q] = self.input_value(tape_b[q])
+            elif op == OP_SWAP:
+                tape_a[q], tape_b[q] = tape_b[q], tape_a[q]
+            elif op == OP_LOAD:
+                tape_b[q] = tape_a[q]
+            elif op == OP_STORE:
+                tape_a[q] = tape_b[q]
+            elif op == OP_ADDA:
+                tape_b[q] = (tape_b[q] + tape_a[q]) % 256
+            elif op == OP_SUBA:
+                tape_b[q] = (tape_b[q] - tape_a[q]) % 256
+            elif op == OP_MULA:
+                tape_b[q] = (tape_b[q] * tape_a[q]) % 256
+            elif op == OP_DIVA:
+                if tape_a[q] != 0:
+                    tape_b[q] = tape_b[q] // tape_a[q]
+            elif op == OP_XORA:
+                tape_b[q] ^= tape_a[q]
+
+    def apply_loop_cells(self, tape_a, tape_b, p, count, cells):
+        """将乘加循环中含纸带A运算的单元一次性执行count轮"""
+        for off, ops in cells:
+            q = p + off
+            a = tape_a[q]
+            if ops[0][0] == OP_XORA:
+                if count % 2:
+                    tape_b[q] ^= a
+                continue
+            m, c = 1, 0
+            for op, arg in ops:
+                if op == OP_ADD:
+                    c += arg
+                elif op == OP_ADDA:
+                    c += a
+                elif op == OP_SUBA:
+                    c -= a
+                elif op == OP_MULA:
+                    m, c = m * a, c * a
+                elif op == OP_LOAD:
+                    m, c = 0, a
+            m, c = affine_power(m % 256, c % 256, count)
+            tape_b[q] = (m * tape_b[q] + c) % 256
+
+    def generate_python(self, program):
+        """将指令列表翻译为Python源码，无法翻译(括号不匹配、嵌套过深或源码过长)时返回None"""
+        depth = max_depth = 0
+        for op, arg in program:
+            if op in (OP_JZ, OP_JNZ) and arg is None:
+                return None
+            if op == OP_JZ:
+                depth += 1
+                max_depth = max(max_depth, depth)
+            elif op == OP_JNZ:
+                depth -= 1
+        # CPython限制静态嵌套的代码块不超过20层，循环内还要留出if/try的层数
+        if max_depth > PYTHON_MAX_LOOP_DEPTH:
+            return None
+
+        # grow 和 scan 返回新的纸带，纸带可能在扩展时换成了稀疏纸带
+        lines = ["def t_program(tape_a, tape_b, p, grow, scan, write, read, apply_cells):",
+                 "    size = len(tape_b)"]
+        indent = "    "
+        # OP_BLOCK之后被替代的原指令: 需要时放在else分支中，到fallback_end为止
+        fallback_end = fallback_indent = None
+        for index, (op, arg) in enumerate(program):
+            if index == fallback_end:
+                if fallback_indent is not None:
+                    indent = fallback_indent
+                fallback_end = None
+            if fallback_end is not None and fallback_indent is None:
+                # 指针不会越过0，不需要原指令
+                continue
+            if op in PYTHON_CELL_OPS:
+                lines.append(indent + PYTHON_CELL_OPS[op].format(q='p', arg=arg))
+            elif op == OP_BLOCK:
+                low, high, shift, skip, adds, cells = arg
+                fallback_end = index + 1 + skip
+                fallback_indent = None
+                if low < 0:
+                    # 指针可能越过0，此时执行原指令
+                    lines.append(f"{indent}if p >= {-low}:")
+                    fallback_indent = indent
+                    indent += "    "
+                if high > 0:
+                    lines.append(f"{indent}if p + {high} >= size:")
+                    lines.append(f"{indent}    size, tape_a, tape_b = grow(p + {high})")
+                # 访问终点单元的操作较多时先移动指针，这些操作的下标不需要加偏移
+                offsets = [off for off, _ in adds] + [off for off, _, _ in cells]
+                base = shift if offsets.count(shift) > offsets.count(0) else 0
+                if base:
+                    lines.append(f"{indent}p += {base}")
+                for off, n in adds:
+                    q = python_offset(off - base)
+                    lines.append(f"{indent}tape_b[{q}] = (tape_b[{q}] + {n}) % 256")
+                for off, cell_op, cell_arg in cells:
+                    lines.append(indent + PYTHON_CELL_OPS[cell_op].format(q=python_offset(off - base), arg=cell_arg))
+                if shift != base:
+                    lines.append(f"{indent}p += {shift - base}")
+                elif not base and not offsets:
+                    lines.append(f"{indent}pass")
+                if fallback_indent is not None:
+                    lines.append(f"{fallback_indent}else:")
+            elif op == OP_MOVE:
+                if arg > 0:
+                    lines.append(f"{indent}p += {arg}")
+                    lines.append(f"{indent}if p >= size:")
+                    lines.append(f"{indent}    size, tape_a, tape_b = grow(p)")
+                else:
+                    lines.append(f"{indent}p -= {-arg}")
+                    lines.append(f"{indent}if p < 0:")
+                    lines.append(f"{indent}    p &= 1")
+            elif op == OP_JZ:
+                lines.append(f"{indent}while tape_b[p]:")
+                indent += "    "
+            elif op == OP_JNZ:
+                if lines[-1].endswith(":"):
+                    lines.append(f"{indent}pass")
+                indent = indent[:-4]
+            elif op == OP_CLEAR:
+                lines.append(f"{indent}tape_b[p] = 0")
+            elif op == OP_MULADD:
+                low, high, inverse, adds, others = arg
+                lines.append(f"{indent}value = tape_b[p]")
+                lines.append(f"{indent}if value and p >= {-low}:")
+                lines.append(f"{indent}    if p + {high} >= size:")
+                lines.append(f"{indent}        size, tape_a, tape_b = grow(p + {high})")
+                lines.append(f"{indent}    count = (-value * {inverse}) % 256")
+                for off, n in adds:
+                    lines.append(f"{indent}    tape_b[p + {off}] = (tape_b[p + {off}] + {n} * count) % 256")
+                if others:
+                    lines.append(f"{indent}    apply_cells(tape_a, tape_b, p, count, {others!r})")
+                lines.append(f"{indent}    tape_b[p] = 0")
+            elif op == OP_SCAN:
+                lines.append(f"{indent}p, size, tape_a, tape_b = scan(p, {arg})")
+        lines.append("    return p")
+        if len(lines) > PYTHON_MAX_LINES:
+            return None
+        return "\n".join(lines) + "\n"
+
+    def compile_to_python(self, program):
+        """将指令列表编译为Python函数，无法编译时返回None"""
+        source = self.generate_python(program)
+        if source is None:
+            return None
+        namespace = {}
+        exec(compile(source, "<turing>", "exec"), namespace)
+        return namespace["t_program"]
+
+    def run_python(self, program):
+        """用Python源码生成后端执行指令列表"""
+        start = 0
+        if len(program) and program[0][0] == OP_PRESET:
+            # 生成的函数只能从头执行，OP_PRESET停在循环之外时从停下的位置开始生成，否则忽略它
+            target = program[0][1][0]
+            depth = 0
+            for index in range(target):
+                op = program[index][0]
+                depth += (op == OP_JZ) - (op == OP_JNZ)
+            if depth == 0:
+                start = self.apply_preset(program)
+        function = self.compile_to_python([program[index] for index in range(start, len(program))])
+        if function is None:
+            # 括号不匹配、嵌套过深或源码过长时退回字节码解释器
+            self.run_compiled(program, start)
+            return
+        self.pointer = function(self.tape_a, self.tape_b, self.pointer, self.grow_and_reload,
+                                self.scan_and_reload, self.output.write_byte, self.input_value,
+                                self.apply_loop_cells)
+        self.instruction_ptr = len(program)
+
+    def run_tiered(self, program, source=""):
+        """分层执行: 先用字节码解释器执行，热循环编译为Python函数后改为执行函数
+
+        解释器按TIER_SLICE_STEPS条指令的时间片执行，每片在某个循环跳回处结束，该循环计数一次。
+        计数达到TIER_THRESHOLD的循环用Python后端编译，指令列表的副本中它开头的[换成OP_LOOP，
+        之后每次进入都调用函数执行完整个循环再回到解释器。外层循环变热时再编译外层，
+        其中已编译的内层循环随之一起重新生成。source 为原始代码，用于在统计中给出循环的位置，
+        统计保存在 self.tier_stats 中。
+        """
+        stats = self.tier_stats = TierStats(source, self.code if source else "")
+        self.tier_functions = {}
+        # 第n个[对应指令列表中第n条OP_JZ，用于报告循环在源码中的位置
+        brackets = [pos for pos, cmd in enumerate(stats.code) if cmd == '[']
+        jumps = [index for index in range(len(program)) if program[index][0] == OP_JZ]
+        positions = dict(zip(jumps, brackets)) if len(jumps) == len(brackets) else {}
+
+        patched = [program[index] for index in range(len(program))]
+        samples = {}
+        start = time.perf_counter()
+        try:
+            ip = 0
+            while not self.run_compiled(patched, ip, TIER_SLICE_STEPS):
+                ip = self.instruction_ptr
+                # 时间片在循环跳回处结束，ip为循环体开头，前一条是循环开头的[
+                loop = ip - 1
+                samples[loop] = samples.get(loop, 0) + 1
+                if samples[loop] == TIER_THRESHOLD and self.compile_tier_loop(program, patched, loop, positions):
+                    # 此时当前单元不为0，从循环开头进入函数与继续执行循环体等价
+                    ip = loop
+        finally:
+            stats.total_time = time.perf_counter() - start
+
+    def compile_tier_loop(self, program, patched, loop, positions):
+        """将从loop开始的循环编译为Python函数并替换为OP_LOOP，无法编译时返回False"""
+        start = time.perf_counter()
+        end = program[loop][1]
+        if end - loop > TIER_MAX_OPS:
+            self.tier_stats.reject_loop(loop, positions.get(loop), end - loop)
+            return False
+        source = self.generate_python([program[index] for index in range(loop, end)])
+        if source is None:
+            # 嵌套过深或生成的源码过长，留在解释器中执行
+            self.tier_stats.reject_loop(loop, positions.get(loop), end - loop)
+            return False
+        self.tier_functions[loop] = compile_loop_source(source)
+        patched[loop] = (OP_LOOP, end)
+        self.tier_stats.add_loop(loop, positions.get(loop), time.perf_counter() - start)
+        return True
+
+    def run_tier_loop(self, loop, p):
+        """执行分层执行中编译好的循环，返回执行后的指针"""
+        start = time.perf_counter()
+        p = self.tier_functions[loop](self.tape_a, self.tape_b, p, self.grow_and_reload,
+                                      self.scan_and_reload, self.output.write_byte, self.input_value,
+                                      self.apply_loop_cells)
+        record = self.tier_stats.loops[loop]
+        record[2] += 1
+        record[3] += time.perf_counter() - start
+        return p
+
+    def grow_tapes(self, index):
+        """扩展纸带使其包含位置index，返回新的纸带长度
+
+        index 超出倍增后的长度(纸带只用到很远处的少数单元)且扩展后长度超过PAGED_TAPE_THRESHOLD时，
+        两条纸带换成PagedTape，持有旧纸带引用的调用者需要重新读取。
+        """
+        size = len(self.tape_a)
+        if index >= size:
+            # 至少扩展为原来的两倍，使扩展的均摊开销为常数
+            new_size = max(index + 1, size * 2)
+            if isinstance(self.tape_a, PagedTape):
+                self.tape_a.resize(new_size)
+                self.tape_b.resize(new_size)
+            elif index >= size * 2 and new_size > PAGED_TAPE_THRESHOLD:
+                self.tape_a = PagedTape(self.tape_a, new_size)
+                self.tape_b = PagedTape(self.tape_b, new_size)
+            else:
+                extension = bytes(new_size - size)
+                self.tape_a.extend(extension)
+                self.tape_b.extend(extension)
+        return len(self.tape_b)
+
+    def grow_and_reload(self, index):
+        """供生成的Python函数使用的grow_tapes，同时返回当前的纸带"""
+        return self.grow_tapes(index), self.tape_a, self.tape_b
+
+    def scan_and_reload(self, p, step):
+        """供生成的Python函数使用的scan_tape，同时返回纸带长度和当前的纸带"""
+        p = self.scan_tape(p, step)
+        return p, len(self.tape_b), self.tape_a, self.tape_b
+
+    def scan_tape(self, p, step):
+        """从p开始按步长step在纸带B上寻找0，返回找到的位置
+
+        向左扫描时如果再走一步就会越过0，则停在最后一个非0位置，由原循环继续处理。
+        """
+        tape_b = self.tape_b
+        if step == 1:
+            found = tape_b.find(0, p)
+            if found < 0:
+                # 纸带之外的单元都是0
+                found = len(tape_b)
+                self.grow_tapes(found)
+            return found
+        if step == -1:
+            found = tape_b.rfind(0, 0, p + 1)
+            return found if found >= 0 else 0
+
+        # 步长大于1时每次切出一段带步长的窗口，用find查找
+        while True:
+            stop = p + step * SCAN_WINDOW
+            if stop < 0:
+                stop = None
+            window = tape_b[p:stop:step]
+            found = window.find(0)
+            if found >= 0:
+                return p + found * step
+            last = p + (len(window) - 1) * step
+            if step < 0 and stop is None:
+                return last
+            p = last + step
+            if p >= len(tape_b):
+                self.grow_tapes(p)
+                return p
+
+    def clear_tapes(self):
+        """将两条纸带清零并恢复初始长度"""
+        self.tape_a = bytearray(TAPE_MIN_SIZE)
+        self.tape_b = bytearray(TAPE_MIN_SIZE)
+        self.pointer = 0
+
+    def set_output(self, target=None, **options):
+        """设置程序输出的目标: None(标准输出)、二进制流、回调函数或OutputSink"""
+        self.output.flush()
+        if isinstance(target, OutputSink):
+            self.output = target
+        else:
+            self.output = OutputSink(target, **options)
+
+    def output_value(self, value):
+        """输出一个数据值"""
+        self.output.write_byte(value)
+
+    def set_input(self, source=None, **options):
+        """设置程序输入的来源: None(标准输入)、bytes、mmap、二进制文件对象或InputSource"""
+        if isinstance(source, InputSource):
+            self.input = source
+        else:
+            self.input = InputSource(source, **options)
+        self.input.before_fill = self.flush_output
+
+    def flush_output(self):
+        """写出已有的输出。输入需要读取新的一块(可能等待用户输入)之前调用，使提示信息先显示出来"""
+        self.output.flush()
+
+    def input_value(self, current=0):
+        """读取一个输入值，current为当前单元的值"""
+        return self.input.read_value(current)
+
+    def build_program(self, code):
+        """将预处理后的代码编译并按优化级别优化，启用缓存时优先使用缓存的结果
+
+        Python后端生成的函数只能从头执行，预先执行的前缀通常停在循环中用不上，因此不做预先执行。
+        """
+        preset = self.optimize_level >= 1 and self.backend != 'python'
+        if self.cache is not None:
+            key = self.cache.key(code, self.optimize_level, preset)
+            program = self.cache.load(key)
+            if program is not None:
+                return program
+
+        program = self.compile_code(code)
+        if self.optimize_level >= 1:
+            program = self.optimize_offsets(self.optimize_loops(program))
+        if preset:
+            program = self.evaluate_prefix(program)
+
+        if self.cache is not None:
+            self.cache.store(key, program)
+        return program
+
+    def run_compiled(self, program, ip=0, max_steps=None):
+        """执行编译后的指令列表
+
+        ip 为开始执行的位置。max_steps 不为None时，执行的指令数超过它后在循环跳回处暂停，
+        状态保存在 self.pointer 和 self.instruction_ptr 中，之后可以从该位置继续执行。
+        指令数只在循环跳回时按循环体长度计入，一次可能多执行一段不含循环的指令。
+        遇到OP_BREAK时也暂停，instruction_ptr 指向它的下一条指令。
+        返回True表示程序已执行完毕。
+        """
+        end = len(program)
+        if ip == 0 and end and program[0][0] == OP_PRESET:
+            ip = self.apply_preset(program)
+        tape_a = self.tape_a
+        tape_b = self.tape_b
+        size = len(tape_b)
+        write = self.output.write_byte
+        p = self.pointer
+        # 不限制时用一个足够大的数，循环中不需要额外判断
+        budget = sys.maxsize if max_steps is None else max_steps
+
+        try:
+            while ip < end:
+                op, arg = program[ip]
+                ip += 1
+
+                if op == OP_ADD:
+                    tape_b[p] = (tape_b[p] + arg) % 256
+                elif op == OP_MOVE:
+                    p += arg
+                    if p < 0:
+                        # 逐步左移越过0后指针在1和0之间来回，结果只取决于奇偶
+                        p &= 1
+                    elif p >= size:
+                        size = self.grow_tapes(p)
+                        tape_a, tape_b = self.tape_a, self.tape_b
+                elif op == OP_JZ:
+                    if tape_b[p] == 0:
+                        if arg is None:
+                            raise RuntimeError(f"未匹配的循环括号 '[' (指令 {ip - 1})")
+                        ip = arg
+                elif op == OP_JNZ:
+                    if tape_b[p] != 0:
+                        if arg is None:
+                            raise RuntimeError(f"未匹配的循环括号 ']' (指令 {ip - 1})")
+                        budget -= ip - arg
+                        ip = arg
+                        if budget < 0:
+                            break
+                elif op == OP_BLOCK:
+                    low, high, shift, skip, adds, cells = arg
+                    if p + low >= 0:
+                        if p + high >= size:
+                            size = self.grow_tapes(p + high)
+                            tape_a, tape_b = self.tape_a, self.tape_b
+                        for off, n in adds:
+                            tape_b[p + off] = (tape_b[p + off] + n) % 256
+                        if cells:
+                            self.apply_offset_cells(tape_a, tape_b, p, cells)
+                        p += shift
+                        ip += skip
+                elif op == OP_CLEAR:
+                    tape_b[p] = 0
+                    ip = program[ip][1]
+                elif op == OP_MULADD:
+                    value = tape_b[p]
+                    low, high, inverse, adds, others = arg
+                    if value and p + low >= 0:
+                        if p + high >= size:
+                            size = self.grow_tapes(p + high)
+                            tape_a, tape_b = self.tape_a, self.tape_b
+                        count = (-value * inverse) % 256
+                        for off, n in adds:
+                            tape_b[p + off] = (tape_b[p + off] + n * count) % 256
+                        if others:
+                            self.apply_loop_cells(tape_a, tape_b, p, count, others)
+                        tape_b[p] = 0
+                        ip = program[ip][1]
+                elif op == OP_SCAN:
+                    p = self.scan_tape(p, arg)
+                    tape_a, tape_b = self.tape_a, self.tape_b
+                    size = len(tape_b)
+                    if tape_b[p] == 0:
+                        ip = program[ip][1]
+                elif op == OP_OUT:
+                    write(tape_b[p])
+                elif op == OP_IN:
+                    tape_b[p] = self.input_value(tape_b[p])
+                elif op == OP_SWAP:
+                    tape_a[p], tape_b[p] = tape_b[p], tape_a[p]
+                elif op == OP_LOAD:
+                    tape_b[p] = tape_a[p]
+                elif op == OP_STORE:
+                    tape_a[p] = tape_b[p]
+                elif op == OP_ADDA:
+                    tape_b[p] = (tape_b[p] + tape_a[p]) % 256
+                elif op == OP_SUBA:
+                    tape_b[p] = (tape_b[p] - tape_a[p]) % 256
+                elif op == OP_MULA:
+                    tape_b[p] = (tape_b[p] * tape_a[p]) % 256
+                elif op == OP_DIVA:
+                    if tape_a[p] != 0:
+                        tape_b[p] = (tape_b[p] // tape_a[p]) % 256
+                elif op == OP_XORA:
+                    tape_b[p] = (tape_b[p] ^ tape_a[p]) % 256
+                elif op == OP_BREAK:
+                    # 调试器的断点放在最后判断，不含断点的程序不受影响
+                    break
+                elif op == OP_LOOP:
+                    p = self.run_tier_loop(ip - 1, p)
+                    tape_a, tape_b = self.tape_a, self.tape_b
+                    size = len(tape_b)
+                    ip = arg
+        finally:
+            # 被中断(KeyboardInterrupt)时也写回状态
+            self.pointer = p
+            self.instruction_ptr = ip
+        return ip >= end
+
+    def code_position(self, program, ip):
+        """编译后指令列表中下标ip处的指令在 self.code 中的位置
+
+        编译保留了所有的 [ 和 ]，ip之前的第n条跳转指令对应代码中的第n个括号。
+        括号之间的指令折叠后不再与字符一一对应，返回ip所在这一段的开头。
+        """
+        if ip >= len(program):
+            return len(self.code)
+        count = sum(1 for index in range(ip) if program[index][0] in (OP_JZ, OP_JNZ, OP_LOOP))
+        if count == 0:
+            return 0
+        brackets = [pos for pos, cmd in enumerate(self.code) if cmd in '[]']
+        return brackets[count - 1] + 1 if count <= len(brackets) else len(self.code)
+
     def adjust_tape_size(self):
         """根据需要调整纸带大小"""
-        required_size = max(len(self.tape_a), abs(self.pointer) + 1)
-        if len(self.tape_a) < required_size:
-            # 扩展纸带
-            extension = [0] * (required_size - len(self.tape_a))
-            self.tape_a.extend(extension)
-            self.tape_b.extend(extension.copy())
-        elif len(self.tape_a) > 500 and required_size < len(self.tape_a) // 2:
-            # 收缩纸带，但保持最小500长度
-            new_size = max(500, required_size)
-            self.tape_a = self.tape_a[:new_size]
-            self.tape_b = self.tape_b[:new_size]
-    
+        size = len(self.tape_a)
+        required_size = abs(self.pointer) + 1
+        if size < required_size:
+            self.grow_tapes(required_size - 1)
+        elif size > TAPE_MIN_SIZE and required_size < size // 4:
+            # 收缩纸带，但保持最小500长度。用量低于四分之一才减半，避免在边界附近反复扩展收缩；
+            # 被截掉的部分必须全为0
+            new_size = max(TAPE_MIN_SIZE, size // 2)
+            tail = size - new_size
+            if self.tape_a.count(0, new_size) == tail and self.tape_b.count(0, new_size) == tail:
+                del self.tape_a[new_size:]
+                del self.tape_b[new_size:]
+
     def normalize_pointer(self):
         """规范化指针位置"""
         if not self.tape_a:
-            self.tape_a = [0]
-            self.tape_b = [0]
+            self.tape_a = bytearray(1)
+            self.tape_b = bytearray(1)
             self.pointer = 0
             return
-        
+
         if self.pointer < 0:
             self.pointer = abs(self.pointer) % len(self.tape_a)
         elif self.pointer >= len(self.tape_a):
             self.pointer %= len(self.tape_a)
-    
+
     def execute(self, code, single_step=False):
         """执行代码"""
         self.code = self.preprocess_code(code)
-        self.brackets = self.match_brackets(self.code)
         self.instruction_ptr = 0
         self.pointer = 0
-        
+
+        program = None
+        try:
+            if single_step or self.debug_mode or self.verbose_mode:
+                # 调试、详细和单步模式需要逐条显示状态，按字符解释执行
+                self.execute_stepwise(single_step)
+            elif self.profiler is not None:
+                self.profiler.start(code, self.code)
+                self.run_profiled(self.code)
+            else:
+                program = self.build_program(self.code)
+                if self.checkpoint is not None:
+                    self.run_checkpointed(program)
+                elif self.backend == 'python':
+                    self.run_python(program)
+                elif self.backend == 'tiered':
+                    self.run_tiered(program, code)
+                else:
+                    self.run_compiled(program)
+                # 执行编译后的指令时 instruction_ptr 是指令列表的下标，换回代码中的位置
+                self.instruction_ptr = len(self.code)
+        except KeyboardInterrupt:
+            if program is not None:
+                self.instruction_ptr = self.code_position(program, self.instruction_ptr)
+            raise
+        finally:
+            self.output.flush()
+        # 执行过程中纸带只扩展不收缩，结束后再统一收缩
+        self.adjust_tape_size()
+
+    def execute_memoized(self, code, results):
+        """执行代码，不读取输入的程序使用结果缓存(ResultCache)
+
+        缓存命中时直接输出缓存的内容；未命中时照常执行，同时记录输出，结束后存入缓存。
+        程序含有 , 或纸带上已有数据(例如交互模式)时结果不确定，照常执行。
+        """
+        cleaned = self.preprocess_code(code)
+        if (',' in cleaned or self.pointer != 0 or isinstance(self.tape_b, PagedTape)
+                or self.tape_a.count(0) != len(self.tape_a) or self.tape_b.count(0) != len(self.tape_b)):
+            self.execute(code)
+            return
+
+        key = results.key(cleaned)
+        try:
+            if results.replay(key, self):
+                self.code = cleaned
+                self.instruction_ptr = len(cleaned)
+                return
+        finally:
+            self.output.flush()
+
+        self.output.start_recording(results.max_size)
+        try:
+            self.execute(code)
+        finally:
+            output = self.output.stop_recording()
+        if output is not None and not isinstance(self.tape_b, PagedTape):
+            results.store(key, self, output)
+
+    def run_profiled(self, code):
+        """执行预处理后的代码并统计每个指令段的执行次数，结果交给 self.profiler
+
+        代码在每个 [ 和 ] 之后切分为指令段，段内没有跳转，段中每个字符的执行次数都等于段的执行次数。
+        可以编译为Python函数时在每段开头加一次计数，否则逐段执行。
+        """
+        segments = []
+        start = 0
+        for pos, cmd in enumerate(code):
+            if cmd in '[]':
+                segments.append((start, pos + 1))
+                start = pos + 1
+        if start < len(code):
+            segments.append((start, len(code)))
+        brackets = self.match_brackets(code)
+        segment_counts = [0] * len(segments)
+
+        function = self.compile_profiled(code, segments)
+        if function is not None:
+            self.pointer = function(self.tape_a, self.tape_b, self.pointer, self.grow_and_reload,
+                                    self.scan_and_reload, self.output.write_byte, self.input_value,
+                                    self.apply_loop_cells, segment_counts)
+        else:
+            self.run_segments(code, segments, segment_counts, brackets)
+        self.instruction_ptr = len(code)
+        self.profiler.finish(segments, segment_counts, brackets)
+
+    def segment_program(self, code, start, end):
+        """指令段中除结尾括号外的指令列表"""
+        program = []
+        for match in TOKEN_PATTERN.finditer(code, start, end):
+            if match.group()[0] not in '[]':
+                instruction = self.fold_token(match.group())
+                if instruction is not None:
+                    program.append(instruction)
+        return program
+
+    def compile_profiled(self, code, segments):
+        """将代码编译为在每个指令段开头计数的Python函数，无法编译时返回None"""
+        if len(self.match_brackets(code)) != code.count('[') + code.count(']'):
+            return None
+        lines = ["def t_profile(tape_a, tape_b, p, grow, scan, write, read, apply_cells, counts):",
+                 "    size = len(tape_b)"]
+        indent = "    "
+        depth = 0
+        for index, (start, end) in enumerate(segments):
+            lines.append(f"{indent}counts[{index}] += 1")
+            # 借用Python后端生成每条指令的代码，去掉函数头、size初始化和return
+            body = self.generate_python(self.segment_program(code, start, end))
+            if body is None:
+                return None
+            lines.extend(indent + line[4:] for line in body.splitlines()[2:-1])
+            if code[end - 1] == '[':
+                depth += 1
+                if depth > PYTHON_MAX_LOOP_DEPTH:
+                    return None
+                lines.append(f"{indent}while tape_b[p]:")
+                indent += "    "
+            elif code[end - 1] == ']':
+                indent = indent[:-4]
+                depth -= 1
+        lines.append("    return p")
+        if len(lines) > PYTHON_MAX_LINES:
+            return None
+        namespace = {}
+        exec(compile("\n".join(lines) + "\n", "<turing-profile>", "exec"), namespace)
+        return namespace["t_profile"]
+
+    def run_segments(self, code, segments, segment_counts, brackets):
+        """逐段执行并计数，用于无法编译为Python函数的代码"""
+        starts = {start: index for index, (start, _) in enumerate(segments)}
+        programs = [self.segment_program(code, start, end) for start, end in segments]
+        pos = 0
+        while pos < len(code):
+            index = starts[pos]
+            segment_counts[index] += 1
+            self.run_compiled(programs[index])
+            end = segments[index][1]
+            cmd = code[end - 1]
+            if cmd in '[]':
+                if end - 1 not in brackets:
+                    raise RuntimeError(f"未匹配的循环括号 '{cmd}' (位置 {end - 1})")
+                if (self.tape_b[self.pointer] == 0) == (cmd == '['):
+                    # [ 时跳过循环，] 时回到循环体开头
+                    end = brackets[end - 1] + 1
+            pos = end
+
+    def execute_program(self, program):
+        """执行已编译的指令序列，例如加载的.tbc文件"""
+        self.code = ""
+        self.instruction_ptr = 0
+        self.pointer = 0
+
+        try:
+            if self.checkpoint is not None:
+                self.run_checkpointed(program)
+            elif self.backend == 'python':
+                self.run_python(program)
+            elif self.backend == 'tiered':
+                self.run_tiered(program)
+            else:
+                self.run_compiled(program)
+        finally:
+            # 没有源码，instruction_ptr 不指向任何字符
+            self.instruction_ptr = len(self.code)
+            self.output.flush()
+        self.adjust_tape_size()
+
+    def compile_file(self, source_path, output_path):
+        """将T源文件编译为.tbc字节码文件"""
+        with open(source_path, 'r') as f:
+            code = self.preprocess_code(f.read())
+        program = self.build_program(code)
+        flags = TBC_FLAG_LOOPS if self.optimize_level >= 1 else 0
+        write_file_atomic(output_path, [encode_bytecode(program, flags)])
+
+    def run_checkpointed(self, program, ip=0):
+        """用字节码解释器分片执行，每隔约 self.checkpoint_interval 秒保存一次检查点
+
+        检查点只在循环跳回处保存，此时状态与从头执行到该处完全一致。执行完毕后删除检查点文件。
+        """
+        last_saved = time.monotonic()
+        while not self.run_compiled(program, ip, CHECKPOINT_SLICE_STEPS):
+            ip = self.instruction_ptr
+            if time.monotonic() - last_saved >= self.checkpoint_interval:
+                self.save_checkpoint(self.checkpoint, program)
+                last_saved = time.monotonic()
+        try:
+            os.unlink(self.checkpoint)
+        except FileNotFoundError:
+            pass
+
+    def save_checkpoint(self, path, program):
+        """将执行状态保存为检查点文件，program 为正在执行的指令序列
+
+        保存前先写出缓冲的输出；已读入但还未被程序读取的输入保存在检查点中。
+        纸带按页压缩，全为0的页不保存，保存的开销与写过的内存成正比。
+        """
+        self.output.flush()
+        pending, exhausted = self.input.pending()
+        program_data = zlib.compress(encode_bytecode(program), 1)
+        input_data = zlib.compress(pending, 1)
+        table = []
+        pages = []
+        for tape_number, tape in enumerate((self.tape_a, self.tape_b)):
+            for number, page in tape_pages(tape):
+                data = zlib.compress(page, 1)
+                table.append(CHECKPOINT_PAGE.pack(tape_number, number, len(data)))
+                pages.append(data)
+        flags = CHECKPOINT_FLAG_INPUT_EXHAUSTED if exhausted else 0
+        header = CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, flags, self.pointer,
+                                        self.instruction_ptr, len(self.tape_b), len(program_data),
+                                        len(input_data), len(pages))
+        write_file_atomic(path, [header, program_data, input_data, *table, *pages])
+
+    def load_checkpoint(self, path):
+        """从检查点文件恢复纸带、指针、指令位置和待读输入，返回要继续执行的指令列表
+
+        文件通过mmap读取，只解压保存了的页，恢复的开销与写过的内存成正比，与纸带长度无关。
+        """
+        with open(path, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"不是有效的T检查点文件: {path}") from None
+        try:
+            with memoryview(data) as view:
+                return self.restore_checkpoint(path, view)
+        except zlib.error:
+            raise ValueError(f"T检查点文件已损坏: {path}") from None
+        finally:
+            data.close()
+
+    def restore_checkpoint(self, path, data):
+        if len(data) < CHECKPOINT_HEADER.size:
+            raise ValueError(f"不是有效的T检查点文件: {path}")
+        (magic, version, flags, pointer, ip, length,
+         program_size, input_size, page_count) = CHECKPOINT_HEADER.unpack_from(data)
+        if magic != CHECKPOINT_MAGIC:
+            raise ValueError(f"不是有效的T检查点文件: {path}")
+        if version != CHECKPOINT_VERSION:
+            raise ValueError(f"不支持的T检查点版本: {version}")
+        offset = CHECKPOINT_HEADER.size
+        page_offset = offset + program_size + input_size + page_count * CHECKPOINT_PAGE.size
+        if len(data) < page_offset:
+            raise ValueError(f"T检查点文件长度不正确: {path}")
+
+        program = BytecodeProgram.from_bytes(zlib.decompress(data[offset:offset + program_size]), path)
+        try:
+            instructions = list(program)
+        finally:
+            program.close()
+        offset += program_size
+        pending = zlib.decompress(data[offset:offset + input_size])
+        offset += input_size
+
+        # 保存的页不到纸带长度的一半时纸带是稀疏的，与grow_tapes一致地用PagedTape
+        paged = length > PAGED_TAPE_THRESHOLD and page_count * PAGE_SIZE < length
+        if paged:
+            tapes = (PagedTape(length=length), PagedTape(length=length))
+        else:
+            tapes = (bytearray(length), bytearray(length))
+        for _ in range(page_count):
+            tape_number, number, size = CHECKPOINT_PAGE.unpack_from(data, offset)
+            offset += CHECKPOINT_PAGE.size
+            page = zlib.decompress(data[page_offset:page_offset + size])
+            page_offset += size
+            start = number << PAGE_BITS
+            if paged:
+                tapes[tape_number].pages[number] = bytearray(page.ljust(PAGE_SIZE, b'\0'))
+            else:
+                end = min(start + len(page), length)
+                tapes[tape_number][start:end] = page[:end - start]
+
+        self.tape_a, self.tape_b = tapes
+        self.pointer = pointer
+        self.instruction_ptr = ip
+        self.input.restore(pending, flags & CHECKPOINT_FLAG_INPUT_EXHAUSTED)
+        return instructions
+
+    def resume(self, path):
+        """从检查点文件恢复状态并继续执行，设置了 self.checkpoint 时继续定期保存检查点"""
+        program = self.load_checkpoint(path)
+        self.code = ""
+        try:
+            if self.checkpoint is not None:
+                self.run_checkpointed(program, self.instruction_ptr)
+            else:
+                self.run_compiled(program, self.instruction_ptr)
+        finally:
+            self.output.flush()
+        self.adjust_tape_size()
+
+    def execute_stepwise(self, single_step=False):
+        """逐字符解释执行 self.code
+
+        调试和详细模式下每步记录到 self.trace，出错或被中断时输出最近的轨迹。
+        """
+        self.brackets = self.match_brackets(self.code)
+        trace = self.trace if self.debug_mode or self.verbose_mode else None
+        if trace is not None:
+            trace.clear()
+        try:
+            self.run_stepwise(single_step, trace)
+        except (Exception, KeyboardInterrupt):
+            if trace is not None:
+                trace.dump(self.code, sys.stderr)
+            raise
+
+    def run_stepwise(self, single_step, trace):
         while self.instruction_ptr < len(self.code):
-            cmd = self.code[self.instruction_ptr]
-            
-            # 调整纸带大小和指针位置
-            self.adjust_tape_size()
-            self.normalize_pointer()
-            
-            if self.debug_mode or self.verbose_mode:
-                self.show_state()
-            
-            if cmd == '>':
-                self.pointer += 1
-            elif cmd == '<':
-                self.pointer -= 1
-            elif cmd == '+':
-                self.tape_b[self.pointer] = (self.tape_b[self.pointer] + 1) % 256
-            elif cmd == '-':
-                self.tape_b[self.pointer] = (self.tape_b[self.pointer] - 1) % 256
-            elif cmd == '.':
-                print(chr(self.tape_b[self.pointer]), end='', flush=True)
-            elif cmd == ',':
-                try:
-                    self.tape_b[self.pointer] = ord(sys.stdin.read(1)) % 256
-                except:
-                    self.tape_b[self.pointer] = 0
-            elif cmd == '[':
-                if self.tape_b[self.pointer] == 0:
-                    self.instruction_ptr = self.brackets[self.instruction_ptr]
-            elif cmd == ']':
-                if self.tape_b[self.pointer] != 0:
-                    self.instruction_ptr = self.brackets[self.instruction_ptr]
-            elif cmd == '!':
-                # 交换两个纸带的指针位置的值
-                self.tape_a[self.pointer], self.tape_b[self.pointer] = self.tape_b[self.pointer], self.tape_a[self.pointer]
-            elif cmd == '@':
-                # 将纸带A当前指令复制到纸带B
-                self.tape_b[self.pointer] = self.tape_a[self.pointer]
-            elif cmd == '#':
-                # 将纸带B当前值复制到纸带A
-                self.tape_a[self.pointer] = self.tape_b[self.pointer]
-            elif cmd == '$':
-                # 纸带B当前值加上纸带A当前指令值
-                self.tape_b[self.pointer] = (self.tape_b[self.pointer] + self.tape_a[self.pointer]) % 256
-            elif cmd == '%':
-                # 纸带B当前值减去纸带A当前指令值
-                self.tape_b[self.pointer] = (self.tape_b[self.pointer] - self.tape_a[self.pointer]) % 256
-            elif cmd == '^':
-                # 纸带B当前值乘以纸带A当前指令值
-                self.tape_b[self.pointer] = (self.tape_b[self.pointer] * self.tape_a[self.pointer]) % 256
-            elif cmd == '&':
-                # 纸带B当前值除以纸带A当前指令值(非零)
-                if self.tape_a[self.pointer] != 0:
-                    self.tape_b[self.pointer] = (self.tape_b[self.pointer] // self.tape_a[self.pointer]) % 256
-            elif cmd == '*':
-                # 纸带B当前值与纸带A当前指令值异或
-                self.tape_b[self.pointer] = (self.tape_b[self.pointer] ^ self.tape_a[self.pointer]) % 256
-            
-            self.instruction_ptr += 1
-            
+            if trace is not None:
+                trace.record(self.instruction_ptr, self.pointer,
+                             self.tape_a[self.pointer], self.tape_b[self.pointer])
+                # 单步执行时每步都显示完整状态，否则按采样间隔显示
+                if single_step or (trace.sample_every and trace.steps % trace.sample_every == 0):
+                    self.show_state()
+
+            self.step_instruction()
+
             if single_step:
                 input("按Enter继续...")
-    
+
+    def step_instruction(self):
+        """按字符解释执行 self.code 中 self.instruction_ptr 处的一条指令"""
+        cmd = self.code[self.instruction_ptr]
+
+        # 只有移动指针的指令需要调整纸带大小和指针位置
+        if cmd == '>':
+            self.pointer += 1
+            if self.pointer >= len(self.tape_a):
+                self.grow_tapes(self.pointer)
+        elif cmd == '<':
+            self.pointer -= 1
+            if self.pointer < 0:
+                self.normalize_pointer()
+        elif cmd == '+':
+            self.tape_b[self.pointer] = (self.tape_b[self.pointer] + 1) % 256
+        elif cmd == '-':
+            self.tape_b[self.pointer] = (self.tape_b[self.pointer] - 1) % 256
+        elif cmd == '.':
+            # 逐步执行时立即写出，保证与状态显示的顺序一致
+            self.output_value(self.tape_b[self.pointer])
+            self.output.flush()
+        elif cmd == ',':
+            self.tape_b[self.pointer] = self.input_value(self.tape_b[self.pointer])
+        elif cmd == '[':
+            if self.tape_b[self.pointer] == 0:
+                self.instruction_ptr = self.brackets[self.instruction_ptr]
+        elif cmd == ']':
+            if self.tape_b[self.pointer] != 0:
+                self.instruction_ptr = self.brackets[self.instruction_ptr]
+        elif cmd == '!':
+            # 交换两个纸带的指针位置的值
+            self.tape_a[self.pointer], self.tape_b[self.pointer] = self.tape_b[self.pointer], self.tape_a[self.pointer]
+        elif cmd == '@':
+            # 将纸带A当前指令复制到纸带B
+            self.tape_b[self.pointer] = self.tape_a[self.pointer]
+        elif cmd == '#':
+            # 将纸带B当前值复制到纸带A
+            self.tape_a[self.pointer] = self.tape_b[self.pointer]
+        elif cmd == '$':
+            # 纸带B当前值加上纸带A当前指令值
+            self.tape_b[self.pointer] = (self.tape_b[self.pointer] + self.tape_a[self.pointer]) % 256
+        elif cmd == '%':
+            # 纸带B当前值减去纸带A当前指令值
+            self.tape_b[self.pointer] = (self.tape_b[self.pointer] - self.tape_a[self.pointer]) % 256
+        elif cmd == '^':
+            # 纸带B当前值乘以纸带A当前指令值
+            self.tape_b[self.pointer] = (self.tape_b[self.pointer] * self.tape_a[self.pointer]) % 256
+        elif cmd == '&':
+            # 纸带B当前值除以纸带A当前指令值(非零)
+            if self.tape_a[self.pointer] != 0:
+                self.tape_b[self.pointer] = (self.tape_b[self.pointer] // self.tape_a[self.pointer]) % 256
+        elif cmd == '*':
+            # 纸带B当前值与纸带A当前指令值异或
+            self.tape_b[self.pointer] = (self.tape_b[self.pointer] ^ self.tape_a[self.pointer]) % 256
+
+        self.instruction_ptr += 1
+
     def show_state(self):
         """显示当前状态"""
         print(f"\n指令指针: {self.instruction_ptr}, 数据指针: {self.pointer}")
-        
+
         # 显示纸带A的指令区域
         start = max(0, self.instruction_ptr - 15)
         end = min(len(self.code), self.instruction_ptr + 16)
@@ -143,7 +2241,7 @@ class TuringInterpreter:
         if self.instruction_ptr >= start and self.instruction_ptr < end:
             tape_a_display[self.instruction_ptr - start] = f"[{tape_a_display[self.instruction_ptr - start]}]"
         print("".join(tape_a_display))
-        
+
         # 显示纸带B的数据区域
         start_b = max(0, self.pointer - 15)
         end_b = min(len(self.tape_b), self.pointer + 16)
@@ -152,336 +2250,318 @@ class TuringInterpreter:
         if self.pointer >= start_b and self.pointer < end_b:
             tape_b_display[self.pointer - start_b] = f"[{tape_b_display[self.pointer - start_b]}]"
         print(" ".join(tape_b_display))
-        
+
         # 显示当前指令的ASCII表示
         if self.instruction_ptr < len(self.code):
             print(f"当前指令: '{self.code[self.instruction_ptr]}' (ASCII: {ord(self.code[self.instruction_ptr])})")
-        
+
         # 显示纸带B当前值的ASCII表示
         print(f"当前数据: {self.tape_b[self.pointer]} (ASCII: {chr(self.tape_b[self.pointer]) if 32 <= self.tape_b[self.pointer] <= 126 else '非可打印字符'})")
 
-def print_help():
-    """打印帮助信息"""
-    print("""
-Turing (T) 机器语言解释器 - 帮助文档
+class Program:
+    """编译好的T程序，可以创建多个互相独立的执行(Execution)
 
-用法: python turing.py [选项] [文件]
+    code 为T源码；也可以用 instructions 直接传入编译好的指令序列，例如BytecodeProgram。
+    """
 
-选项:
-  -h, --help     显示此帮助信息
-  -v, --verbose  显示详细执行过程
-  -s, --step     单步执行模式
-  -f, --full     显示完整文档
+    def __init__(self, code=None, instructions=None, optimize_level=1, cache=None):
+        if instructions is None:
+            compiler = TuringInterpreter()
+            compiler.optimize_level = optimize_level
+            compiler.cache = cache
+            instructions = compiler.build_program(compiler.preprocess_code(code))
+        self.instructions = instructions
 
-如果没有提供文件参数，解释器将进入交互模式。
+    def start(self, input=None, output=None, **input_options):
+        """创建一个新的执行，参数含义见Execution"""
+        return Execution(self, input, output, **input_options)
 
-指令集:
-  >   数据指针右移
-  <   数据指针左移
-  +   当前数据值加1
-  -   当前数据值减1
-  .   输出当前数据值对应的ASCII字符
-  ,   输入一个字符并存储其ASCII值
-  [   如果当前数据值为0，跳转到匹配的]
-  ]   如果当前数据值不为0，跳转到匹配的[
-  !   交换纸带A和纸带B当前指针位置的值
-  @   将纸带A当前指令复制到纸带B
-  #   将纸带B当前值复制到纸带A
-  $   纸带B当前值加上纸带A当前指令值
-  %   纸带B当前值减去纸带A当前指令值
-  ^   纸带B当前值乘以纸带A当前指令值
-  &   纸带B当前值除以纸带A当前指令值(非零)
-  *   纸带B当前值与纸带A当前指令值异或
+class Execution:
+    """一个T程序的执行过程，可以分多次运行，每次只做有限的工作
 
-纸带:
-  解释器使用两个无限长的纸带:
-  - 纸带A: 存储指令代码
-  - 纸带B: 存储数据值
-  纸带初始长度为500，会根据需要自动扩展或收缩。
+    每个执行有自己的纸带、指针和输入输出缓冲区，run返回后状态完整保留，
+    因此一个线程可以轮流推进多个执行。input 同 TuringInterpreter.set_input；
+    output 为None时输出收集在 self.output 中，否则同 TuringInterpreter.set_output。
+    """
 
-交互模式:
-  在交互模式下，您可以:
-  - 直接输入T代码执行
-  - 输入"quit"或"exit"退出
-  - 输入"clear"清空纸带
-  - 输入"state"查看当前状态
-""")
+    def __init__(self, program, input=None, output=None, **input_options):
+        self.program = program
+        self.interpreter = TuringInterpreter()
+        self.interpreter.set_input(input, **input_options)
+        if output is None:
+            self.output = bytearray()
+            output = self.output.extend
+        self.interpreter.set_output(output, line_buffered=False)
+        self.finished = False
 
-def print_full_docs():
-    """打印完整文档"""
-    print("""
-Turing (T) 机器语言解释器 - 完整文档
+    def run(self, max_steps=None):
+        """继续执行，最多约max_steps条指令(None表示执行到结束)，返回是否已执行完毕"""
+        if self.finished:
+            return True
+        interpreter = self.interpreter
+        start = interpreter.instruction_ptr
+        try:
+            self.finished = interpreter.run_compiled(self.program.instructions, start, max_steps)
+        finally:
+            interpreter.output.flush()
+        if self.finished:
+            interpreter.adjust_tape_size()
+        return self.finished
 
-1. 概述
-T是一种基于双纸带模型的图灵完备编程语言，灵感来自Brainfuck但进行了扩展和重构。
-它使用两个无限长的纸带：一个用于存储指令(纸带A)，一个用于存储数据(纸带B)。
+class Debugger:
+    """T程序的调试器: 断点、单步、跳过循环、继续执行和运行到指定位置
 
-2. 纸带模型
-- 纸带A: 存储指令代码，初始加载用户提供的程序
-- 纸带B: 存储数据值，初始全为0
-- 指针: 指向当前操作的纸带B位置
-- 指令指针: 指向当前执行的纸带A位置
+    位置都是源码(预处理之前)中的字符下标，落在注释上的位置对应其后的第一条指令。
+    继续执行时断点编译为指令流中的OP_BREAK，断点之外的代码按正常优化后的指令执行；
+    单步执行按字符解释执行。状态保存在解释器中，interpreter.instruction_ptr 为预处理后代码中的位置。
+    """
 
-3. 指令集详解
->   数据指针右移一位
-<   数据指针左移一位
-+   当前数据值加1(模256)
--   当前数据值减1(模256)
-.   输出当前数据值对应的ASCII字符
-,   从输入读取一个字符并存储其ASCII值
-[   开始循环，如果当前数据值为0，跳转到匹配的]
-]   结束循环，如果当前数据值不为0，跳转到匹配的[
-!   交换纸带A和纸带B当前指针位置的值
-@   将纸带A当前指令复制到纸带B
-#   将纸带B当前值复制到纸带A
-$   纸带B当前值加上纸带A当前指令值
-%   纸带B当前值减去纸带A当前指令值
-^   纸带B当前值乘以纸带A当前指令值
-&   纸带B当前值除以纸带A当前指令值(非零)
-*   纸带B当前值与纸带A当前指令值异或
+    def __init__(self, interpreter, source):
+        self.interpreter = interpreter
+        self.source_length = len(source)
+        # 预处理后代码中每条指令在源码中的位置
+        self.source_positions = [match.start() for match in INSTRUCTION_PATTERN.finditer(source)]
+        interpreter.code = interpreter.preprocess_code(source)
+        interpreter.brackets = interpreter.match_brackets(interpreter.code)
+        interpreter.instruction_ptr = 0
+        interpreter.pointer = 0
+        self.breakpoints = set()  # 预处理后代码中的位置
 
-4. 技术细节
-- 所有数值操作都是模256的
-- 纸带初始长度为500，会根据需要自动扩展
-- 当指针超出当前纸带长度时，会自动环绕
-- 负数指针取其绝对值
+    def code_position(self, position):
+        """源码位置对应的预处理后代码中的位置"""
+        return bisect_left(self.source_positions, position)
 
-5. 示例程序
-5.1 打印"Hello, World!"
-++++++++[>++++++++>+++++++++++>+++++<<<-]>.>++.+++++++..+++.>-.
-------------.<++++++++.--------.+++.------.--------.>+.
+    def location(self):
+        """下一条要执行的指令在源码中的位置，已执行完毕时返回None"""
+        ip = self.interpreter.instruction_ptr
+        return self.source_positions[ip] if ip < len(self.source_positions) else None
 
-5.2 简单加法器 (输入两个数字，输出它们的和)
-,>,<[->+<]>.
+    @property
+    def finished(self):
+        return self.interpreter.instruction_ptr >= len(self.interpreter.code)
 
-5.3 纸带交互示例 (使用纸带A和B的交互功能)
-+++@#$  # 将3存入纸带B，然后进行各种操作
+    def add_breakpoint(self, position):
+        self.breakpoints.add(self.code_position(position))
 
-6. 实现说明
-- 解释器用Python实现
-- 支持交互模式和文件模式
-- 提供调试和单步执行功能
-""")
+    def remove_breakpoint(self, position):
+        self.breakpoints.discard(self.code_position(position))
 
-def interactive_mode(interpreter):
-    """交互模式"""
-    print("Turing (T) 机器语言解释器 - 交互模式")
-    print("输入T代码执行，或输入help获取帮助")
-    
-    while True:
+    def step(self):
+        """执行一条指令，返回是否已执行完毕"""
+        interpreter = self.interpreter
+        if not self.finished:
+            try:
+                interpreter.step_instruction()
+            finally:
+                interpreter.output.flush()
+        return self.finished
+
+    def step_over(self):
+        """当前指令为 [ 时执行完整个循环，否则同step"""
+        interpreter = self.interpreter
+        ip = interpreter.instruction_ptr
+        if not self.finished and interpreter.code[ip] == '[' and ip in interpreter.brackets:
+            return self.run_until(interpreter.brackets[ip] + 1)
+        return self.step()
+
+    def continue_execution(self):
+        """执行到下一个断点或程序结束，返回是否已执行完毕"""
+        return self.run_until(None)
+
+    def run_to(self, position):
+        """执行到源码中position处的指令、下一个断点或程序结束，返回是否已执行完毕"""
+        return self.run_until(self.code_position(position))
+
+    def run_until(self, stop):
+        """用字节码解释器从当前位置执行，到达断点或预处理后代码中的stop位置时暂停
+
+        当前位置也插入一个OP_BREAK作为入口，之后再经过它时不暂停，直接继续执行。
+        """
+        interpreter = self.interpreter
+        start = interpreter.instruction_ptr
+        if self.finished:
+            return True
+        positions = self.breakpoints | {start}
+        if stop is not None:
+            positions.add(stop)
+        program, breaks = interpreter.compile_with_breaks(interpreter.code, positions)
+        ip = breaks[start] + 1
         try:
-            user_input = input("T> ").strip()
-            
-            if user_input.lower() in ('quit', 'exit'):
+            while not interpreter.run_compiled(program, ip):
+                position = program[interpreter.instruction_ptr - 1][1]
+                if position in self.breakpoints or position == stop:
+                    interpreter.instruction_ptr = position
+                    return self.finished
+                ip = interpreter.instruction_ptr
+        finally:
+            interpreter.output.flush()
+        interpreter.instruction_ptr = len(interpreter.code)
+        interpreter.adjust_tape_size()
+        return True
+
+# 批量执行中一个任务的结果。status 为 'ok'、'step-limit'、'timeout' 或 'error: ...'
+BatchResult = namedtuple('BatchResult', 'input output status elapsed input_size')
+
+# 工作进程中的已编译程序，由 init_batch_worker 设置
+batch_program = None
+
+def init_batch_worker(instructions):
+    """工作进程的初始化函数，每个进程只接收一次编译好的指令列表"""
+    global batch_program
+    batch_program = Program(instructions=instructions)
+
+def run_batch_job(data, max_steps=None, timeout=None, eof='0'):
+    """在工作进程中执行一个任务。data 为输入文件路径或bytes"""
+    start = time.perf_counter()
+    deadline = None if timeout is None else start + timeout
+    name = data if isinstance(data, str) else None
+    size = 0
+    try:
+        if name is not None:
+            with open(name, 'rb') as f:
+                data = f.read()
+        size = len(data)
+        execution = batch_program.start(input=data, eof=eof)
+        status = 'ok'
+        remaining = max_steps
+        while True:
+            steps = BATCH_SLICE_STEPS if remaining is None else min(remaining, BATCH_SLICE_STEPS)
+            if execution.run(steps):
                 break
-            elif user_input.lower() == 'help':
-                print_help()
-            elif user_input.lower() == 'clear':
-                interpreter = TuringInterpreter()
-                print("纸带已清空")
-            elif user_input.lower() == 'state':
-                interpreter.show_state()
-            elif user_input:
-                interpreter.execute(user_input)
-        except KeyboardInterrupt:
-            print("\n中断执行")
-        except Exception as e:
-            print(f"错误: {e}")
+            if remaining is not None:
+                remaining -= steps
+                if remaining <= 0:
+                    status = 'step-limit'
+                    break
+            if deadline is not None and time.perf_counter() > deadline:
+                status = 'timeout'
+                break
+        output = bytes(execution.output)
+    except Exception as e:
+        output = b''
+        status = f"error: {e}"
+    return BatchResult(name, output, status, time.perf_counter() - start, size)
 
-def main():
-    interpreter = TuringInterpreter()
-    
-    if len(sys.argv) > 1:
-        if sys.argv[1] in ('-h', '--help'):
-            print_help()
-        elif sys.argv[1] in ('-f', '--full'):
-            print_full_docs()
-        elif sys.argv[1] in ('-v', '--verbose'):
-            interpreter.verbose_mode = True
-            if len(sys.argv) > 2:
-                with open(sys.argv[2], 'r') as f:
-                    code = f.read()
-                interpreter.execute(code)
-            else:
-                interactive_mode(interpreter)
-        elif sys.argv[1] in ('-s', '--step'):
-            interpreter.step_mode = True
-            if len(sys.argv) > 2:
-                with open(sys.argv[2], 'r') as f:
-                    code = f.read()
-                interpreter.execute(code, single_step=True)
+def run_batch(program, inputs, jobs=None, ordered=True, max_steps=None, timeout=None, eof='0'):
+    """用进程池对多个输入执行同一个程序，逐个产生BatchResult
+
+    program 为Program或编译好的指令序列，只编译一次并在每个工作进程中加载一次。
+    inputs 为输入文件路径或bytes的可迭代对象，按需读取，同时排队的任务不超过进程数的
+    BATCH_QUEUE_PER_WORKER倍。ordered 为True时按输入的顺序产生结果，否则按完成的顺序。
+    jobs 为进程数，默认等于CPU核数。max_steps 和 timeout(秒) 限制每个任务。
+    """
+    instructions = program.instructions if isinstance(program, Program) else program
+    # 进程间传递的是普通列表，mmap加载的字节码需要先解码
+    instructions = list(instructions)
+    window = (jobs or os.cpu_count() or 1) * BATCH_QUEUE_PER_WORKER
+    inputs = enumerate(inputs)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_batch_worker,
+                             initargs=(instructions,)) as executor:
+        def submit():
+            """提交下一个输入，没有更多输入时返回False"""
+            for index, data in inputs:
+                future = executor.submit(run_batch_job, data, max_steps, timeout, eof)
+                futures[future] = index
+                pending.append(future)
+                return True
+            return False
+
+        futures = {}          # 未完成或未产生结果的任务 -> 输入的序号
+        pending = deque()     # 按提交顺序排列的任务
+        while len(pending) < window and submit():
+            pass
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
             else:
-                interactive_mode(interpreter)
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                result = future.result()
+                index = futures.pop(future)
+                if result.input is None:
+                    # bytes输入用序号标识
+                    result = result._replace(input=index)
+                submit()
+                yield result
+
+def batch_main(args):
+    """batch 子命令: python turing.py batch [选项] 程序 输入文件..."""
+    output_dir = None
+    jobs = None
+    ordered = True
+    max_steps = None
+    timeout = None
+    eof = '0'
+
+    while args and args[0].startswith('-'):
+        option = args.pop(0)
+        if option in ('-o', '--output') and args:
+            output_dir = args.pop(0)
+        elif option in ('-j', '--jobs') and args:
+            jobs = int(args.pop(0))
+        elif option in ('-u', '--unordered'):
+            ordered = False
+        elif option in ('-m', '--max-steps') and args:
+            max_steps = int(args.pop(0))
+        elif option in ('-t', '--timeout') and args:
+            timeout = float(args.pop(0))
+        elif option in ('-e', '--eof') and args:
+            eof = args.pop(0)
+            if eof not in EOF_MODES:
+                print(f"未知的EOF处理方式: {eof}，可选: {', '.join(EOF_MODES)}")
+                return
         else:
-            with open(sys.argv[1], 'r') as f:
-                code = f.read()
-            interpreter.execute(code)
+            print(f"未知选项: {option}")
+            print_help()
+            return
+    if len(args) < 2:
+        print("batch 需要程序文件和至少一个输入文件")
+        return
+
+    program_path, inputs = args[0], args[1:]
+    if output_dir is not None:
+        # 输出文件与输入同名，不同目录中的同名输入会互相覆盖
+        names = {}
+        for path in inputs:
+            other = names.setdefault(os.path.basename(path), path)
+            if other != path:
+                print(f"输入文件 {other} 和 {path} 同名，-o 的输出会互相覆盖")
+                return
+    if program_path.endswith('.tbc'):
+        bytecode = BytecodeProgram(program_path)
+        try:
+            program = Program(instructions=list(bytecode))
+        finally:
+            bytecode.close()
     else:
-        interactive_mode(interpreter)
+        with open(program_path, 'r') as f:
+            program = Program(f.read(), cache=ProgramCache())
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
 
-if __name__ == "__main__":
-    main()
-import sys
-import re
-import readline  # 用于改进命令行输入体验
+    start = time.perf_counter()
+    count = failed = total_size = 0
+    stdout = sys.stdout.buffer
+    for result in run_batch(program, inputs, jobs, ordered, max_steps, timeout, eof):
+        count += 1
+        total_size += result.input_size
+        if result.status != 'ok':
+            failed += 1
+            print(f"{result.input}: {result.status}", file=sys.stderr)
+        if output_dir is not None:
+            with open(os.path.join(output_dir, os.path.basename(result.input)), 'wb') as f:
+                f.write(result.output)
+        else:
+            stdout.write(result.output)
+            stdout.flush()
 
-class TuringInterpreter:
-    def __init__(self):
-        # 初始化两个纸带，默认长度500
-        self.tape_a = [0] * 500  # 指令纸带
-        self.tape_b = [0] * 500  # 数据纸带
-        self.pointer = 0         # 当前指针位置
-        self.instruction_ptr = 0 # 当前执行指令的位置
-        self.code = ""           # 原始代码
-        self.brackets = {}       # 用于存储循环匹配
-        self.debug_mode = False
-        self.verbose_mode = False
-        self.step_mode = False
-        
-    def preprocess_code(self, code):
-        """预处理代码，去除注释和无效字符"""
-        # 只保留有效指令字符
-        cleaned_code = re.sub(r'[^><+\-.,\[\]!@#$%^&*]', '', code)
-        return cleaned_code
-    
-    def match_brackets(self, code):
-        """匹配循环括号，建立跳转表"""
-        stack = []
-        brackets = {}
-        for pos, cmd in enumerate(code):
-            if cmd == '[':
-                stack.append(pos)
-            elif cmd == ']':
-                if stack:
-                    start = stack.pop()
-                    brackets[start] = pos
-                    brackets[pos] = start
-        return brackets
-    
-    def adjust_tape_size(self):
-        """根据需要调整纸带大小"""
-        required_size = max(len(self.tape_a), abs(self.pointer) + 1)
-        if len(self.tape_a) < required_size:
-            # 扩展纸带
-            extension = [0] * (required_size - len(self.tape_a))
-            self.tape_a.extend(extension)
-            self.tape_b.extend(extension.copy())
-        elif len(self.tape_a) > 500 and required_size < len(self.tape_a) // 2:
-            # 收缩纸带，但保持最小500长度
-            new_size = max(500, required_size)
-            self.tape_a = self.tape_a[:new_size]
-            self.tape_b = self.tape_b[:new_size]
-    
-    def normalize_pointer(self):
-        """规范化指针位置"""
-        if not self.tape_a:
-            self.tape_a = [0]
-            self.tape_b = [0]
-            self.pointer = 0
-            return
-        
-        if self.pointer < 0:
-            self.pointer = abs(self.pointer) % len(self.tape_a)
-        elif self.pointer >= len(self.tape_a):
-            self.pointer %= len(self.tape_a)
-    
-    def execute(self, code, single_step=False):
-        """执行代码"""
-        self.code = self.preprocess_code(code)
-        self.brackets = self.match_brackets(self.code)
-        self.instruction_ptr = 0
-        self.pointer = 0
-        
-        while self.instruction_ptr < len(self.code):
-            cmd = self.code[self.instruction_ptr]
-            
-            # 调整纸带大小和指针位置
-            self.adjust_tape_size()
-            self.normalize_pointer()
-            
-            if self.debug_mode or self.verbose_mode:
-                self.show_state()
-            
-            if cmd == '>':
-                self.pointer += 1
-            elif cmd == '<':
-                self.pointer -= 1
-            elif cmd == '+':
-                self.tape_b[self.pointer] = (self.tape_b[self.pointer] + 1) % 256
-            elif cmd == '-':
-                self.tape_b[self.pointer] = (self.tape_b[self.pointer] - 1) % 256
-            elif cmd == '.':
-                print(chr(self.tape_b[self.pointer]), end='', flush=True)
-            elif cmd == ',':
-                try:
-                    self.tape_b[self.pointer] = ord(sys.stdin.read(1)) % 256
-                except:
-                    self.tape_b[self.pointer] = 0
-            elif cmd == '[':
-                if self.tape_b[self.pointer] == 0:
-                    self.instruction_ptr = self.brackets[self.instruction_ptr]
-            elif cmd == ']':
-                if self.tape_b[self.pointer] != 0:
-                    self.instruction_ptr = self.brackets[self.instruction_ptr]
-            elif cmd == '!':
-                # 交换两个纸带的指针位置的值
-                self.tape_a[self.pointer], self.tape_b[self.pointer] = self.tape_b[self.pointer], self.tape_a[self.pointer]
-            elif cmd == '@':
-                # 将纸带A当前指令复制到纸带B
-                self.tape_b[self.pointer] = self.tape_a[self.pointer]
-            elif cmd == '#':
-                # 将纸带B当前值复制到纸带A
-                self.tape_a[self.pointer] = self.tape_b[self.pointer]
-            elif cmd == '$':
-                # 纸带B当前值加上纸带A当前指令值
-                self.tape_b[self.pointer] = (self.tape_b[self.pointer] + self.tape_a[self.pointer]) % 256
-            elif cmd == '%':
-                # 纸带B当前值减去纸带A当前指令值
-                self.tape_b[self.pointer] = (self.tape_b[self.pointer] - self.tape_a[self.pointer]) % 256
-            elif cmd == '^':
-                # 纸带B当前值乘以纸带A当前指令值
-                self.tape_b[self.pointer] = (self.tape_b[self.pointer] * self.tape_a[self.pointer]) % 256
-            elif cmd == '&':
-                # 纸带B当前值除以纸带A当前指令值(非零)
-                if self.tape_a[self.pointer] != 0:
-                    self.tape_b[self.pointer] = (self.tape_b[self.pointer] // self.tape_a[self.pointer]) % 256
-            elif cmd == '*':
-                # 纸带B当前值与纸带A当前指令值异或
-                self.tape_b[self.pointer] = (self.tape_b[self.pointer] ^ self.tape_a[self.pointer]) % 256
-            
-            self.instruction_ptr += 1
-            
-            if single_step:
-                input("按Enter继续...")
-    
-    def show_state(self):
-        """显示当前状态"""
-        print(f"\n指令指针: {self.instruction_ptr}, 数据指针: {self.pointer}")
-        
-        # 显示纸带A的指令区域
-        start = max(0, self.instruction_ptr - 15)
-        end = min(len(self.code), self.instruction_ptr + 16)
-        print("纸带A (指令):")
-        tape_a_display = list(self.code[start:end])
-        if self.instruction_ptr >= start and self.instruction_ptr < end:
-            tape_a_display[self.instruction_ptr - start] = f"[{tape_a_display[self.instruction_ptr - start]}]"
-        print("".join(tape_a_display))
-        
-        # 显示纸带B的数据区域
-        start_b = max(0, self.pointer - 15)
-        end_b = min(len(self.tape_b), self.pointer + 16)
-        print("纸带B (数据):")
-        tape_b_display = [str(x) for x in self.tape_b[start_b:end_b]]
-        if self.pointer >= start_b and self.pointer < end_b:
-            tape_b_display[self.pointer - start_b] = f"[{tape_b_display[self.pointer - start_b]}]"
-        print(" ".join(tape_b_display))
-        
-        # 显示当前指令的ASCII表示
-        if self.instruction_ptr < len(self.code):
-            print(f"当前指令: '{self.code[self.instruction_ptr]}' (ASCII: {ord(self.code[self.instruction_ptr])})")
-        
-        # 显示纸带B当前值的ASCII表示
-        print(f"当前数据: {self.tape_b[self.pointer]} (ASCII: {chr(self.tape_b[self.pointer]) if 32 <= self.tape_b[self.pointer] <= 126 else '非可打印字符'})")
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else 0.0
+    throughput = total_size / elapsed / 1e6 if elapsed else 0.0
+    print(f"{count} 个任务, 失败 {failed}, 用时 {elapsed:.2f} 秒, "
+          f"{rate:.1f} 任务/秒, 输入 {throughput:.2f} MB/秒", file=sys.stderr)
 
 def print_help():
     """打印帮助信息"""
@@ -489,14 +2569,40 @@ def print_help():
 Turing (T) 机器语言解释器 - 帮助文档
 
 用法: python turing.py [选项] [文件]
+      python turing.py compile 源文件 [输出文件]
+      python turing.py batch [批量选项] 程序 输入文件...
 
 选项:
   -h, --help     显示此帮助信息
-  -v, --verbose  显示详细执行过程
+  -v, --verbose  记录执行轨迹，出错或中断时输出最近的步骤
   -s, --step     单步执行模式
+  -p, --python   将程序编译为Python函数后执行(更快)
+  -j, --jit      分层执行: 先解释执行，只把执行得多的循环编译为Python函数
+  -J, --jit-report  分层执行，结束后报告编译了哪些循环及各层的用时
+  -i, --input 文件  从文件读取程序输入(默认读取标准输入)
+  -e, --eof 方式    输入结束后 , 的行为: 0(默认)、unchanged(保持原值)、-1
+  -n, --no-cache 不使用编译缓存(默认缓存在~/.cache/turing/)
+  -m, --memo     缓存不含 , 的程序的输出，再次执行同一程序时直接输出
+  -M, --memo-size MiB  输出缓存的大小上限(默认256)，同时启用 -m
+  -P, --profile  统计各指令和循环的执行次数，结束后报告最热的循环
+  -t, --trace 步数   详细模式下保留的轨迹步数(默认1000)
+  -S, --sample 步数  详细模式下每隔多少步显示一次完整状态(默认不显示)
+  -c, --checkpoint 文件   定期将执行状态保存到检查点文件，执行完毕后删除(不能与 -p、-j 同用)
+  -C, --checkpoint-interval 秒数  保存检查点的间隔(默认60)
+  -r, --resume 文件       从检查点文件继续执行，不需要文件参数
   -f, --full     显示完整文档
 
 如果没有提供文件参数，解释器将进入交互模式。
+compile 将源文件编译为.tbc字节码文件(默认与源文件同名)，.tbc文件可以像源文件一样直接执行。
+
+batch 只编译一次程序，用多个进程对每个输入文件分别执行，输出按输入顺序写到标准输出。
+批量选项:
+  -o, --output 目录     每个输入的输出写到目录中的同名文件，输入文件不能重名
+  -j, --jobs 数量       进程数(默认为CPU核数)
+  -u, --unordered       按完成的顺序输出
+  -m, --max-steps 数量  每个任务的指令数上限
+  -t, --timeout 秒数    每个任务的时间上限
+  -e, --eof 方式        输入结束后 , 的行为
 
 指令集:
   >   数据指针右移
@@ -528,6 +2634,7 @@ Turing (T) 机器语言解释器 - 帮助文档
   - 输入"quit"或"exit"退出
   - 输入"clear"清空纸带
   - 输入"state"查看当前状态
+  - 输入"trace"查看最近一次详细模式执行的轨迹
 """)
 
 def print_full_docs():
@@ -550,7 +2657,7 @@ T是一种基于双纸带模型的图灵完备编程语言，灵感来自Brainfu
 <   数据指针左移一位
 +   当前数据值加1(模256)
 -   当前数据值减1(模256)
-.   输出当前数据值对应的ASCII字符
+.   输出当前数据值(一个字节)
 ,   从输入读取一个字符并存储其ASCII值
 [   开始循环，如果当前数据值为0，跳转到匹配的]
 ]   结束循环，如果当前数据值不为0，跳转到匹配的[
@@ -565,9 +2672,10 @@ $   纸带B当前值加上纸带A当前指令值
 
 4. 技术细节
 - 所有数值操作都是模256的
-- 纸带初始长度为500，会根据需要自动扩展
+- 纸带初始长度为500，会根据需要自动扩展；超过约100万个单元后改为按页稀疏存储，只为写过的区域分配内存
 - 当指针超出当前纸带长度时，会自动环绕
 - 负数指针取其绝对值
+- 输入结束后 , 默认存入0，可用-e选项改为保持原值或存入-1
 
 5. 示例程序
 5.1 打印"Hello, World!"
@@ -584,26 +2692,49 @@ $   纸带B当前值加上纸带A当前指令值
 - 解释器用Python实现
 - 支持交互模式和文件模式
 - 提供调试和单步执行功能
+- 执行前将代码编译为折叠后的指令列表，并识别[-]、[->+<]、[>]等常见循环
+- 循环之间的一段指针移动和单元操作(如 >+>>-<<<$)合并为一条按偏移访问单元的指令，
+  最后一次性移动指针，纸带边界只检查一次
+- 编译时先执行程序开头到第一个 , 之前的部分(最多约100万条指令)，将纸带、指针和输出记录在
+  编译结果中，执行时直接从该处开始。配合编译缓存和.tbc文件，重复执行时跳过初始化阶段。
+  -p 选项生成的函数只能从头执行，此时不做预先执行
+- 使用-p选项时进一步将程序翻译为Python函数执行
+- 使用-j选项时分层执行: 字节码解释器每执行约1万条指令在循环跳回处停一次并为该循环计数，
+  计数达到3次的循环用Python后端编译为函数，之后进入该循环时调用函数执行完整个循环。
+  短程序不必为编译整个程序付出代价，长时间运行的程序的热循环仍然以编译后的速度执行
+- 从文件执行时编译结果缓存在~/.cache/turing/，再次运行同一程序时跳过编译
+- 使用-m选项时，不含 , 的程序的全部输出和最终的纸带状态也保存在该目录，再次运行时直接输出。
+  总大小超过上限时删除最久未使用的结果
+- compile 子命令将程序保存为.tbc字节码文件: 文件头之后是定长的操作码和操作数，
+  跳转目标已预先计算。执行时通过mmap直接读取，不需要解析源码
+- 使用-P选项时统计每条指令和每个循环的执行次数，报告最热的循环及其在源文件中的行号和列号
+- 使用-c选项时定期保存检查点，包括两条纸带、指针、指令位置、编译后的程序和已读入但未使用的输入。
+  纸带按页用zlib压缩，全为0的页不保存；恢复时通过mmap读取文件，只解压保存了的页。
+  检查点与平台无关，可以用-r选项在另一台机器上继续执行，之后的输入从新指定的输入中读取
+- Debugger 类提供断点、单步、跳过循环、继续执行和执行到指定位置。断点作为专门的指令编译进
+  指令列表，断点之间按优化后的指令执行；没有断点的程序不受影响
 """)
 
 def interactive_mode(interpreter):
     """交互模式"""
     print("Turing (T) 机器语言解释器 - 交互模式")
     print("输入T代码执行，或输入help获取帮助")
-    
+
     while True:
         try:
             user_input = input("T> ").strip()
-            
+
             if user_input.lower() in ('quit', 'exit'):
                 break
             elif user_input.lower() == 'help':
                 print_help()
             elif user_input.lower() == 'clear':
-                interpreter = TuringInterpreter()
+                interpreter.clear_tapes()
                 print("纸带已清空")
             elif user_input.lower() == 'state':
                 interpreter.show_state()
+            elif user_input.lower() == 'trace':
+                interpreter.trace.dump(interpreter.code)
             elif user_input:
                 interpreter.execute(user_input)
         except KeyboardInterrupt:
@@ -613,32 +2744,116 @@ def interactive_mode(interpreter):
 
 def main():
     interpreter = TuringInterpreter()
-    
-    if len(sys.argv) > 1:
-        if sys.argv[1] in ('-h', '--help'):
+    args = sys.argv[1:]
+    single_step = False
+    use_cache = True
+    resume_path = None
+    results = None
+    tier_report = False
+
+    if args and args[0] == 'batch':
+        batch_main(args[1:])
+        return
+
+    compile_only = bool(args) and args[0] == 'compile'
+    if compile_only:
+        args.pop(0)
+
+    # 解析选项，选项可以组合使用，最后一个参数为代码文件
+    while args and args[0].startswith('-'):
+        option = args.pop(0)
+        if option in ('-h', '--help'):
             print_help()
-        elif sys.argv[1] in ('-f', '--full'):
+            return
+        elif option in ('-f', '--full'):
             print_full_docs()
-        elif sys.argv[1] in ('-v', '--verbose'):
+            return
+        elif option in ('-v', '--verbose'):
             interpreter.verbose_mode = True
-            if len(sys.argv) > 2:
-                with open(sys.argv[2], 'r') as f:
-                    code = f.read()
-                interpreter.execute(code)
-            else:
-                interactive_mode(interpreter)
-        elif sys.argv[1] in ('-s', '--step'):
+        elif option in ('-s', '--step'):
             interpreter.step_mode = True
-            if len(sys.argv) > 2:
-                with open(sys.argv[2], 'r') as f:
-                    code = f.read()
-                interpreter.execute(code, single_step=True)
-            else:
-                interactive_mode(interpreter)
+            single_step = True
+        elif option in ('-p', '--python'):
+            interpreter.backend = 'python'
+        elif option in ('-j', '--jit'):
+            interpreter.backend = 'tiered'
+        elif option in ('-J', '--jit-report'):
+            interpreter.backend = 'tiered'
+            tier_report = True
+        elif option in ('-i', '--input') and args:
+            input_file = open(args.pop(0), 'rb')
+            interpreter.set_input(input_file, eof=interpreter.input.eof)
+        elif option in ('-e', '--eof') and args:
+            mode = args.pop(0)
+            if mode not in EOF_MODES:
+                print(f"未知的EOF处理方式: {mode}，可选: {', '.join(EOF_MODES)}")
+                return
+            interpreter.input.eof = mode
+        elif option in ('-n', '--no-cache'):
+            use_cache = False
+        elif option in ('-m', '--memo'):
+            results = results or ResultCache()
+        elif option in ('-M', '--memo-size') and args:
+            results = results or ResultCache()
+            results.max_size = int(float(args.pop(0)) * 1024 * 1024)
+        elif option in ('-P', '--profile'):
+            interpreter.profiler = Profiler()
+        elif option in ('-t', '--trace') and args:
+            interpreter.trace = TraceRecorder(int(args.pop(0)), interpreter.trace.sample_every)
+        elif option in ('-S', '--sample') and args:
+            interpreter.trace.sample_every = int(args.pop(0))
+        elif option in ('-c', '--checkpoint') and args:
+            interpreter.checkpoint = args.pop(0)
+        elif option in ('-C', '--checkpoint-interval') and args:
+            interpreter.checkpoint_interval = float(args.pop(0))
+        elif option in ('-r', '--resume') and args:
+            resume_path = args.pop(0)
+        else:
+            print(f"未知选项: {option}")
+            print_help()
+            return
+
+    if interpreter.checkpoint is not None and interpreter.backend != 'bytecode':
+        # 检查点只能在字节码解释器的时间片之间保存
+        print("-c 只能用于字节码解释器，不能与 -p、-j、-J 同时使用")
+        return
+
+    if compile_only:
+        if not args:
+            print("compile 需要源文件参数")
+            return
+        output_path = args[1] if len(args) > 1 else os.path.splitext(args[0])[0] + '.tbc'
+        interpreter.compile_file(args[0], output_path)
+    elif resume_path is not None:
+        interpreter.resume(resume_path)
+    elif args and args[0].endswith('.tbc'):
+        if single_step or interpreter.verbose_mode:
+            print("字节码文件不支持单步和详细模式，请使用源文件")
+            return
+        program = BytecodeProgram(args[0])
+        try:
+            interpreter.execute_program(program)
+        finally:
+            program.close()
+        if tier_report and interpreter.tier_stats is not None:
+            print(interpreter.tier_stats.report(), file=sys.stderr)
+    elif args:
+        with open(args[0], 'r') as f:
+            code = f.read()
+        if use_cache:
+            interpreter.cache = ProgramCache()
+        if (results is not None and not single_step and not interpreter.debug_mode
+                and not interpreter.verbose_mode and interpreter.profiler is None
+                and interpreter.checkpoint is None):
+            interpreter.execute_memoized(code, results)
         else:
-            with open(sys.argv[1], 'r') as f:
-                code = f.read()
-            interpreter.execute(code)
+            interpreter.execute(code, single_step=single_step)
+        if interpreter.verbose_mode:
+            interpreter.trace.dump(interpreter.code, sys.stderr)
+        if interpreter.profiler is not None:
+            print(interpreter.profiler.report(), file=sys.stderr)
+        if tier_report and interpreter.tier_stats is not None:
+            print(interpreter.tier_stats.report(), file=sys.stderr)
     else:
         interactive_mode(interpreter)
 
@@ -1,38 +1,66 @@
 import tkinter as tk
+import tkinter.font as tkfont
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
 import sys
 import importlib.util
 import subprocess
-import threading
+import multiprocessing
+import io
 import re
 
+# 编辑或滚动停止多少毫秒后更新语法高亮，连续输入时只更新一次
+HIGHLIGHT_DELAY_MS = 100
+
+# 行号栏在数字两侧留出的宽度(像素)
+LINE_NUMBER_PADDING = 8
+
+# 界面每隔多少毫秒读取一次程序输出，每次最多写入多少字节
+OUTPUT_POLL_MS = 50
+OUTPUT_BATCH_SIZE = 65536
+
+# 输出区域最多保留的行数，超过时删除最早的行
+OUTPUT_MAX_LINES = 10000
+
+# 状态区域最多保留的行数
+STATE_MAX_LINES = 2000
+
+# 语法高亮使用的标签
+HIGHLIGHT_TAGS = ('basic_ops', 'io_ops', 'loop_ops', 'extended_ops', 'comment')
+
+# 同一类指令的连续字符，组名为对应的标签
+HIGHLIGHT_PATTERN = re.compile(r'(?P<basic_ops>[><+\-]+)|(?P<io_ops>[.,]+)|(?P<loop_ops>[\[\]]+)'
+                               r'|(?P<extended_ops>[!@#$%^&*]+)')
+
 class TuringIDE:
     def __init__(self, root):
         self.root = root
         self.root.title("Turing (T) 语言 IDE")
         self.root.geometry("1000x700")
-        
+
         # 当前解释器实例
         self.interpreter = None
         self.interpreter_version = None
-        
+
+        # 等待执行的语法高亮更新(after返回的任务id)
+        self.highlight_job = None
+
         # 创建菜单栏
         self.create_menu()
-        
+
         # 创建主界面
         self.create_main_interface()
-        
+
         # 设置语法高亮
         self.setup_highlight_tags()
-        
+
         # 加载可用解释器
         self.load_interpreters()
-        
+
     def create_menu(self):
         """创建菜单栏"""
         menubar = tk.Menu(self.root)
-        
+
         # 文件菜单
         file_menu = tk.Menu(menubar, tearoff=0)
         file_menu.add_command(label="新建", command=self.new_file, accelerator="Ctrl+N")
@@ -41,7 +69,7 @@ class TuringIDE:
         file_menu.add_separator()
         file_menu.add_command(label="退出", command=self.root.quit)
         menubar.add_cascade(label="文件", menu=file_menu)
-        
+
         # 编辑菜单
         edit_menu = tk.Menu(menubar, tearoff=0)
         edit_menu.add_command(label="撤销", command=self.undo, accelerator="Ctrl+Z")
@@ -51,28 +79,32 @@ class TuringIDE:
         edit_menu.add_command(label="复制", command=self.copy, accelerator="Ctrl+C")
         edit_menu.add_command(label="粘贴", command=self.paste, accelerator="Ctrl+V")
         menubar.add_cascade(label="编辑", menu=edit_menu)
-        
+
         # 运行菜单
         run_menu = tk.Menu(menubar, tearoff=0)
         run_menu.add_command(label="运行", command=self.run_code, accelerator="F5")
         run_menu.add_command(label="停止", command=self.stop_execution, accelerator="Ctrl+F2")
         run_menu.add_command(label="单步执行", command=self.step_execution, accelerator="F10")
+        run_menu.add_command(label="跳过循环", command=self.step_over, accelerator="Shift+F10")
+        run_menu.add_command(label="运行到光标处", command=self.run_to_cursor, accelerator="Ctrl+F10")
+        run_menu.add_separator()
+        run_menu.add_command(label="切换断点", command=self.toggle_breakpoint, accelerator="F9")
         menubar.add_cascade(label="运行", menu=run_menu)
-        
+
         # 设置菜单
         settings_menu = tk.Menu(menubar, tearoff=0)
         settings_menu.add_command(label="选择解释器", command=self.select_interpreter)
         settings_menu.add_command(label="主题设置", command=self.theme_settings)
         menubar.add_cascade(label="设置", menu=settings_menu)
-        
+
         # 帮助菜单
         help_menu = tk.Menu(menubar, tearoff=0)
         help_menu.add_command(label="帮助文档", command=self.show_help)
         help_menu.add_command(label="关于", command=self.show_about)
         menubar.add_cascade(label="帮助", menu=help_menu)
-        
+
         self.root.config(menu=menubar)
-        
+
         # 绑定快捷键
         self.root.bind('<Control-n>', lambda e: self.new_file())
         self.root.bind('<Control-o>', lambda e: self.open_file())
@@ -80,79 +112,88 @@ class TuringIDE:
         self.root.bind('<F5>', lambda e: self.run_code())
         self.root.bind('<Control-F2>', lambda e: self.stop_execution())
         self.root.bind('<F10>', lambda e: self.step_execution())
-        
+        self.root.bind('<Shift-F10>', lambda e: self.step_over())
+        self.root.bind('<Control-F10>', lambda e: self.run_to_cursor())
+        self.root.bind('<F9>', lambda e: self.toggle_breakpoint())
+
     def create_main_interface(self):
         """创建主界面"""
         # 主框架
         main_frame = ttk.Frame(self.root)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        
+
         # 顶部工具栏
         toolbar = ttk.Frame(main_frame)
         toolbar.pack(fill=tk.X, pady=(0, 5))
-        
+
         # 解释器选择
         ttk.Label(toolbar, text="解释器:").pack(side=tk.LEFT, padx=(0, 5))
         self.interpreter_var = tk.StringVar()
         self.interpreter_combo = ttk.Combobox(toolbar, textvariable=self.interpreter_var, state="readonly")
         self.interpreter_combo.pack(side=tk.LEFT, padx=(0, 10))
         self.interpreter_combo.bind('<<ComboboxSelected>>', self.on_interpreter_selected)
-        
+
         # 运行按钮
         ttk.Button(toolbar, text="运行 (F5)", command=self.run_code).pack(side=tk.LEFT, padx=5)
         ttk.Button(toolbar, text="停止 (Ctrl+F2)", command=self.stop_execution).pack(side=tk.LEFT, padx=5)
         ttk.Button(toolbar, text="单步 (F10)", command=self.step_execution).pack(side=tk.LEFT, padx=5)
-        
+
         # 代码编辑区和输出区分割
         paned_window = ttk.PanedWindow(main_frame, orient=tk.VERTICAL)
         paned_window.pack(fill=tk.BOTH, expand=True)
-        
+
         # 代码编辑器
         code_frame = ttk.Frame(paned_window)
         paned_window.add(code_frame, weight=70)
-        
+
         ttk.Label(code_frame, text="代码编辑器:").pack(anchor=tk.W)
         self.code_text = scrolledtext.ScrolledText(code_frame, wrap=tk.WORD, font=("Consolas", 11))
         self.code_text.pack(fill=tk.BOTH, expand=True, pady=(0, 5))
-        
+
         # 添加行号
         self.add_line_numbers()
-        
+
         # 输出区域
         output_frame = ttk.Frame(paned_window)
         paned_window.add(output_frame, weight=30)
-        
+
         # 输出标签
         output_notebook = ttk.Notebook(output_frame)
         output_notebook.pack(fill=tk.BOTH, expand=True)
-        
+
         # 程序输出标签页
         output_tab = ttk.Frame(output_notebook)
         output_notebook.add(output_tab, text="输出")
-        
+
         self.output_text = scrolledtext.ScrolledText(output_tab, wrap=tk.WORD, font=("Consolas", 11))
         self.output_text.pack(fill=tk.BOTH, expand=True)
         self.output_text.config(state=tk.DISABLED)
-        
+
         # 状态输出标签页
         state_tab = ttk.Frame(output_notebook)
         output_notebook.add(state_tab, text="状态")
-        
+
         self.state_text = scrolledtext.ScrolledText(state_tab, wrap=tk.WORD, font=("Consolas", 11))
         self.state_text.pack(fill=tk.BOTH, expand=True)
         self.state_text.config(state=tk.DISABLED)
-        
+
         # 底部状态栏
         self.status_bar = ttk.Label(self.root, text="就绪", relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
-        
+
         # 当前文件路径
         self.current_file = None
-        
-        # 执行线程
-        self.execution_thread = None
-        self.stop_execution_flag = False
-        
+
+        # 执行进程，在多次运行之间复用；worker_busy 为True时正在执行，worker_paused 为True时调试暂停中
+        self.worker = None
+        self.worker_connection = None
+        self.worker_path = None
+        self.worker_busy = False
+        self.worker_paused = False
+
+        # 定期读取执行进程消息的任务
+        self.output_job = None
+
     def setup_highlight_tags(self):
         """设置语法高亮的标签"""
         # 定义不同指令的颜色
@@ -161,161 +202,199 @@ class TuringIDE:
         self.code_text.tag_configure('loop_ops', foreground='red')
         self.code_text.tag_configure('extended_ops', foreground='purple')
         self.code_text.tag_configure('comment', foreground='gray')
-        
-        # 绑定按键事件来实时更新高亮
-        self.code_text.bind('<KeyRelease>', self.highlight_syntax)
-        self.code_text.bind('<ButtonRelease>', self.highlight_syntax)
-        
+
+        # 调试用的标签: 断点和暂停时下一条要执行的指令
+        self.code_text.tag_configure('breakpoint', background='#ffc0c0')
+        self.code_text.tag_configure('current_step', background='yellow')
+
+        # 按键和鼠标操作后延迟更新高亮
+        self.code_text.bind('<KeyRelease>', self.schedule_highlight)
+        self.code_text.bind('<ButtonRelease>', self.schedule_highlight)
+
+    def schedule_highlight(self, event=None):
+        """在HIGHLIGHT_DELAY_MS毫秒后更新语法高亮，期间再次调用时重新计时"""
+        if self.highlight_job is not None:
+            self.root.after_cancel(self.highlight_job)
+        self.highlight_job = self.root.after(HIGHLIGHT_DELAY_MS, self.highlight_syntax)
+
     def highlight_syntax(self, event=None):
-        """执行语法高亮"""
-        # 定义不同指令的分类
-        basic_ops = ['>', '<', '+', '-']
-        io_ops = ['.', ',']
-        loop_ops = ['[', ']']
-        extended_ops = ['!', '@', '#', '$', '%', '^', '&', '*']
-        
-        # 先移除所有现有的标签
-        for tag in ['basic_ops', 'io_ops', 'loop_ops', 'extended_ops', 'comment']:
-            self.code_text.tag_remove(tag, '1.0', tk.END)
-        
-        # 获取所有文本
-        text = self.code_text.get('1.0', tk.END)
-        
-        # 高亮注释（以#开头的行）
-        for line_num, line in enumerate(text.split('\n'), start=1):
-            if line.strip().startswith('#'):
-                start_pos = f"{line_num}.0"
-                end_pos = f"{line_num}.end"
-                self.code_text.tag_add('comment', start_pos, end_pos)
-        
-        # 高亮指令
-        for i, char in enumerate(text):
-            pos = f'1.0 + {i} chars'
-            if char in basic_ops:
-                self.code_text.tag_add('basic_ops', pos, f'{pos} + 1 chars')
-            elif char in io_ops:
-                self.code_text.tag_add('io_ops', pos, f'{pos} + 1 chars')
-            elif char in loop_ops:
-                self.code_text.tag_add('loop_ops', pos, f'{pos} + 1 chars')
-            elif char in extended_ops:
-                self.code_text.tag_add('extended_ops', pos, f'{pos} + 1 chars')
-    
+        """更新可见区域的语法高亮
+
+        高亮只与所在行有关，因此只处理当前显示的字符，从左上角到右下角所在显示行的末尾。
+        很长的一行自动换行后只有一部分可见，其余部分滚动到可见时再处理。
+        """
+        self.highlight_job = None
+        start = self.code_text.index('@0,0')
+        end = self.code_text.index(f'@{self.code_text.winfo_width()},{self.code_text.winfo_height()}'
+                                   f' display lineend')
+        first, column = map(int, start.split('.'))
+        last, last_column = map(int, end.split('.'))
+        for line_num in range(first, last + 1):
+            self.highlight_line(line_num, column if line_num == first else 0,
+                                last_column if line_num == last else None)
+
+    def highlight_line(self, line_num, start=0, end=None):
+        """重新高亮一行中从start列到end列(None表示行尾)的字符，同一类指令的连续字符作为一段添加标签"""
+        start_pos = f"{line_num}.{start}"
+        end_pos = f"{line_num}.end" if end is None else f"{line_num}.{end}"
+        for tag in HIGHLIGHT_TAGS:
+            self.code_text.tag_remove(tag, start_pos, end_pos)
+
+        # 以#开头的行是注释，行首可能不在可见范围内，用search找到第一个非空白字符
+        first_char = self.code_text.search(r'\S', f"{line_num}.0", f"{line_num}.end", regexp=True)
+        if first_char and self.code_text.get(first_char) == '#':
+            self.code_text.tag_add('comment', start_pos, end_pos)
+            return
+
+        text = self.code_text.get(start_pos, end_pos)
+        ranges = {}
+        for match in HIGHLIGHT_PATTERN.finditer(text):
+            ranges.setdefault(match.lastgroup, []).extend(
+                (f"{line_num}.{start + match.start()}", f"{line_num}.{start + match.end()}"))
+        for tag, indices in ranges.items():
+            self.code_text.tag_add(tag, *indices)
+
     def add_line_numbers(self):
-        """为代码编辑器添加行号"""
-        # 创建一个框架来包含行号和文本
-        line_number_frame = ttk.Frame(self.code_text.master)
-        line_number_frame.pack(side=tk.LEFT, fill=tk.Y)
-        
-        self.line_numbers = tk.Text(line_number_frame, width=4, takefocus=0, 
-                                   border=0, background='lightgrey', 
-                                   state=tk.DISABLED, font=("Consolas", 11))
-        self.line_numbers.pack(side=tk.LEFT, fill=tk.Y)
-        
-        # 绑定滚动事件
+        """为代码编辑器添加行号栏
+
+        行号画在Canvas上，每次只画当前显示的行，与文件的总行数无关。
+        """
+        self.line_numbers = tk.Canvas(self.code_text.master, width=LINE_NUMBER_PADDING, takefocus=0,
+                                      highlightthickness=0, background='lightgrey')
+        self.line_numbers.pack(side=tk.LEFT, fill=tk.Y, before=self.code_text)
+        self.line_number_font = tkfont.Font(font=("Consolas", 11))
+        self.line_number_job = None
+        self.line_number_view = None  # 上次绘制时的可见范围和总行数，不变时不重画
+
+        # 滚动、内容变化和窗口大小变化时更新行号
         self.code_text.config(yscrollcommand=self.on_text_scroll)
-        self.line_numbers.config(yscrollcommand=self.on_text_scroll)
-        
-        # 绑定按键事件更新行号
-        self.code_text.bind('<KeyRelease>', self.update_line_numbers)
-        self.code_text.bind('<MouseWheel>', self.update_line_numbers)
-        
+        self.code_text.bind('<<Modified>>', self.on_text_modified)
+        self.code_text.bind('<Configure>', self.schedule_line_numbers)
+
         self.update_line_numbers()
-        
-    def on_text_scroll(self, *args):
-        """同步文本和行号的滚动"""
-        self.code_text.yview(*args)
-        self.line_numbers.yview(*args)
-        
+
+    def on_text_scroll(self, first, last):
+        """代码编辑器的视图变化时更新滚动条、行号和语法高亮"""
+        self.code_text.vbar.set(first, last)
+        self.schedule_line_numbers()
+
+        # 新滚动到可见区域的行需要高亮
+        self.schedule_highlight()
+
+    def on_text_modified(self, event=None):
+        """代码被修改时更新行号和语法高亮"""
+        # 清除修改标志，下次修改时才会再次产生<<Modified>>事件；清除本身也会产生一次事件
+        if not self.code_text.edit_modified():
+            return
+        self.code_text.edit_modified(False)
+        self.schedule_line_numbers()
+        self.schedule_highlight()
+
+    def schedule_line_numbers(self, event=None):
+        """在空闲时更新行号，同一轮事件中的多次请求只更新一次"""
+        if self.line_number_job is None:
+            self.line_number_job = self.root.after_idle(self.update_line_numbers)
+
     def update_line_numbers(self, event=None):
-        """更新行号显示"""
-        self.line_numbers.config(state=tk.NORMAL)
-        self.line_numbers.delete(1.0, tk.END)
-        
-        # 获取代码行数
-        lines = self.code_text.get(1.0, tk.END).count('\n')
-        
-        # 添加行号
-        for i in range(1, lines + 2):
-            self.line_numbers.insert(tk.END, f"{i}\n")
-            
-        self.line_numbers.config(state=tk.DISABLED)
-        
-        # 更新语法高亮
-        self.highlight_syntax()
-        
+        """重画可见行的行号，可见范围和总行数都没有变化时不做任何事"""
+        self.line_number_job = None
+        first = self.code_text.index('@0,0')
+        last = self.code_text.index(f'@0,{self.code_text.winfo_height()}')
+        lines = int(self.code_text.index('end-1c').split('.')[0])
+        view = (first, last, lines)
+        if view == self.line_number_view:
+            return
+        self.line_number_view = view
+
+        # 行数的位数变化时调整宽度
+        width = self.line_number_font.measure(str(lines)) + LINE_NUMBER_PADDING
+        if int(self.line_numbers.cget('width')) != width:
+            self.line_numbers.config(width=width)
+
+        self.line_numbers.delete('all')
+        for line_num in range(int(first.split('.')[0]), int(last.split('.')[0]) + 1):
+            # 自动换行的行只在第一个显示行标出行号，行首不可见时不标
+            info = self.code_text.dlineinfo(f"{line_num}.0")
+            if info is not None:
+                self.line_numbers.create_text(width - LINE_NUMBER_PADDING // 2, info[1], anchor=tk.NE,
+                                              text=str(line_num), font=self.line_number_font)
+
     def load_interpreters(self):
         """加载可用的解释器"""
         interpreter_dir = "./interpreter"
         interpreters = {}
-        
+
         if os.path.exists(interpreter_dir):
             for file in os.listdir(interpreter_dir):
                 if file.endswith('.py'):
                     version = file[:-3]  # 去掉.py扩展名
                     interpreters[version] = os.path.join(interpreter_dir, file)
-        
+
         self.interpreters = interpreters
-        
+
         # 更新下拉框
         self.interpreter_combo['values'] = list(interpreters.keys())
-        
+
         if interpreters:
             # 默认选择第一个
             first_version = list(interpreters.keys())[0]
             self.interpreter_var.set(first_version)
             self.load_interpreter(first_version)
-        
+
     def load_interpreter(self, version):
         """加载指定版本的解释器"""
         if version in self.interpreters:
             try:
                 file_path = self.interpreters[version]
-                
+
                 # 动态导入模块
                 spec = importlib.util.spec_from_file_location(f"interpreter_{version}", file_path)
                 interpreter_module = importlib.util.module_from_spec(spec)
                 spec.loader.exec_module(interpreter_module)
-                
+
                 # 创建解释器实例
                 self.interpreter = interpreter_module.TuringInterpreter()
                 self.interpreter_version = version
-                
+
                 self.status_bar.config(text=f"已加载解释器: {version}")
-                
+
+                # 预先启动执行进程，运行时不需要等待进程启动
+                self.restart_worker()
+
             except Exception as e:
                 messagebox.showerror("错误", f"加载解释器失败: {e}")
                 self.interpreter = None
                 self.interpreter_version = None
         else:
             messagebox.showerror("错误", f"找不到解释器版本: {version}")
-    
+
     def on_interpreter_selected(self, event):
         """当选择解释器时"""
         version = self.interpreter_var.get()
         self.load_interpreter(version)
-    
+
     def select_interpreter(self):
         """选择解释器对话框"""
         if not self.interpreters:
             messagebox.showinfo("信息", "没有找到可用的解释器")
             return
-            
+
         # 创建选择对话框
         dialog = tk.Toplevel(self.root)
         dialog.title("选择解释器")
         dialog.geometry("400x300")
         dialog.transient(self.root)
         dialog.grab_set()
-        
+
         ttk.Label(dialog, text="可用解释器版本:").pack(pady=10)
-        
+
         # 创建列表框
         listbox = tk.Listbox(dialog)
         listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-        
+
         for version in self.interpreters.keys():
             listbox.insert(tk.END, version)
-        
+
         # 选择按钮
         def on_select():
             selection = listbox.curselection()
@@ -324,13 +403,13 @@ class TuringIDE:
                 self.interpreter_var.set(version)
                 self.load_interpreter(version)
                 dialog.destroy()
-        
+
         button_frame = ttk.Frame(dialog)
         button_frame.pack(fill=tk.X, pady=10)
-        
+
         ttk.Button(button_frame, text="选择", command=on_select).pack(side=tk.LEFT, padx=10)
         ttk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.RIGHT, padx=10)
-    
+
     def theme_settings(self):
         """主题设置对话框"""
         dialog = tk.Toplevel(self.root)
@@ -338,38 +417,38 @@ class TuringIDE:
         dialog.geometry("400x300")
         dialog.transient(self.root)
         dialog.grab_set()
-        
+
         ttk.Label(dialog, text="语法高亮颜色设置:").pack(pady=10)
-        
+
         # 颜色设置控件
         colors_frame = ttk.Frame(dialog)
         colors_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-        
+
         # 基本操作颜色
         ttk.Label(colors_frame, text="基本操作 (> < + -):").grid(row=0, column=0, sticky=tk.W)
         self.basic_color_var = tk.StringVar(value='blue')
         ttk.Entry(colors_frame, textvariable=self.basic_color_var).grid(row=0, column=1)
-        
+
         # I/O操作颜色
         ttk.Label(colors_frame, text="I/O操作 (. ,):").grid(row=1, column=0, sticky=tk.W)
         self.io_color_var = tk.StringVar(value='green')
         ttk.Entry(colors_frame, textvariable=self.io_color_var).grid(row=1, column=1)
-        
+
         # 循环操作颜色
         ttk.Label(colors_frame, text="循环操作 ([ ]):").grid(row=2, column=0, sticky=tk.W)
         self.loop_color_var = tk.StringVar(value='red')
         ttk.Entry(colors_frame, textvariable=self.loop_color_var).grid(row=2, column=1)
-        
+
         # 扩展操作颜色
         ttk.Label(colors_frame, text="扩展操作 (! @ # $ % ^ & *):").grid(row=3, column=0, sticky=tk.W)
         self.extended_color_var = tk.StringVar(value='purple')
         ttk.Entry(colors_frame, textvariable=self.extended_color_var).grid(row=3, column=1)
-        
+
         # 注释颜色
         ttk.Label(colors_frame, text="注释 (#):").grid(row=4, column=0, sticky=tk.W)
         self.comment_color_var = tk.StringVar(value='gray')
         ttk.Entry(colors_frame, textvariable=self.comment_color_var).grid(row=4, column=1)
-        
+
         # 应用按钮
         def apply_colors():
             self.code_text.tag_configure('basic_ops', foreground=self.basic_color_var.get())
@@ -379,39 +458,39 @@ class TuringIDE:
             self.code_text.tag_configure('comment', foreground=self.comment_color_var.get())
             self.highlight_syntax()
             dialog.destroy()
-        
+
         button_frame = ttk.Frame(dialog)
         button_frame.pack(fill=tk.X, pady=10)
-        
+
         ttk.Button(button_frame, text="应用", command=apply_colors).pack(side=tk.LEFT, padx=10)
         ttk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.RIGHT, padx=10)
-    
+
     def new_file(self):
         """新建文件"""
         self.code_text.delete(1.0, tk.END)
         self.current_file = None
         self.status_bar.config(text="新建文件")
-        
+
     def open_file(self):
         """打开文件"""
         file_path = filedialog.askopenfilename(
             filetypes=[("T语言文件", "*.t"), ("所有文件", "*.*")]
         )
-        
+
         if file_path:
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     content = f.read()
-                
+
                 self.code_text.delete(1.0, tk.END)
                 self.code_text.insert(1.0, content)
                 self.current_file = file_path
                 self.status_bar.config(text=f"已打开: {file_path}")
                 self.update_line_numbers()
-                
+
             except Exception as e:
                 messagebox.showerror("错误", f"打开文件失败: {e}")
-    
+
     def save_file(self):
         """保存文件"""
         if self.current_file:
@@ -424,150 +503,248 @@ class TuringIDE:
             if not file_path:
                 return
             self.current_file = file_path
-        
+
         try:
             content = self.code_text.get(1.0, tk.END)
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(content)
-            
+
             self.status_bar.config(text=f"已保存: {file_path}")
-            
+
         except Exception as e:
             messagebox.showerror("错误", f"保存文件失败: {e}")
-    
+
     def undo(self):
         """撤销"""
         try:
             self.code_text.edit_undo()
         except tk.TclError:
             pass
-    
+
     def redo(self):
         """重做"""
         try:
             self.code_text.edit_redo()
         except tk.TclError:
             pass
-    
+
     def cut(self):
         """剪切"""
         self.code_text.event_generate("<<Cut>>")
-    
+
     def copy(self):
         """复制"""
         self.code_text.event_generate("<<Copy>>")
-    
+
     def paste(self):
         """粘贴"""
         self.code_text.event_generate("<<Paste>>")
-    
+
     def run_code(self):
-        """运行代码"""
+        """运行代码，调试暂停时继续执行到下一个断点"""
         if not self.interpreter:
             messagebox.showerror("错误", "请先选择解释器")
             return
-            
-        # 清空输出
-        self.output_text.config(state=tk.NORMAL)
-        self.output_text.delete(1.0, tk.END)
-        self.output_text.config(state=tk.DISABLED)
-        
-        self.state_text.config(state=tk.NORMAL)
-        self.state_text.delete(1.0, tk.END)
-        self.state_text.config(state=tk.DISABLED)
-        
-        # 获取代码
-        code = self.code_text.get(1.0, tk.END)
-        
-        # 在新线程中执行
-        self.stop_execution_flag = False
-        self.execution_thread = threading.Thread(target=self.execute_code, args=(code, False))
-        self.execution_thread.daemon = True
-        self.execution_thread.start()
-        
-        self.status_bar.config(text="正在执行...")
-    
+
+        if self.worker_paused:
+            self.send_debug_command(('continue',), "正在执行...")
+        else:
+            self.start_session('run', "正在执行...")
+
     def step_execution(self):
-        """单步执行"""
+        """单步执行。未在调试时开始调试，停在第一条指令之前"""
+        if not self.interpreter:
+            messagebox.showerror("错误", "请先选择解释器")
+            return
+
+        if self.worker_paused:
+            self.send_debug_command(('step',), "单步执行中...")
+        else:
+            self.start_session('debug', "单步执行中...")
+
+    def step_over(self):
+        """单步执行，当前指令为 [ 时执行完整个循环"""
         if not self.interpreter:
             messagebox.showerror("错误", "请先选择解释器")
             return
-            
+
+        if self.worker_paused:
+            self.send_debug_command(('step_over',), "单步执行中...")
+        else:
+            self.start_session('debug', "单步执行中...", ('step_over',))
+
+    def run_to_cursor(self):
+        """执行到光标处的指令，中途遇到断点时也会暂停"""
+        if not self.interpreter:
+            messagebox.showerror("错误", "请先选择解释器")
+            return
+
+        position = len(self.code_text.get(1.0, tk.INSERT))
+        if self.worker_paused:
+            self.send_debug_command(('run_to', position), "正在执行...")
+        else:
+            self.start_session('debug', "正在执行...", ('run_to', position))
+
+    def toggle_breakpoint(self):
+        """在光标处的字符上设置或取消断点"""
+        if 'breakpoint' in self.code_text.tag_names(tk.INSERT):
+            self.code_text.tag_remove('breakpoint', tk.INSERT)
+        else:
+            self.code_text.tag_add('breakpoint', tk.INSERT)
+
+    def breakpoint_positions(self):
+        """所有断点在代码中的字符位置"""
+        positions = []
+        ranges = self.code_text.tag_ranges('breakpoint')
+        # 相邻字符上的断点会合并为一段
+        for start, end in zip(ranges[::2], ranges[1::2]):
+            offset = len(self.code_text.get(1.0, start))
+            positions.extend(range(offset, offset + len(self.code_text.get(start, end))))
+        return positions
+
+    def stop_execution(self):
+        """停止执行。直接结束执行进程并启动一个新的，供下次运行使用"""
+        if self.worker_busy or self.worker_paused:
+            self.restart_worker()
+        self.code_text.tag_remove('current_step', 1.0, tk.END)
+        self.status_bar.config(text="执行已停止")
+
+    def start_worker(self):
+        """启动执行进程并加载当前选择的解释器"""
+        context = multiprocessing.get_context('spawn')
+        self.worker_connection, child_connection = context.Pipe()
+        self.worker_path = self.interpreters[self.interpreter_version]
+        self.worker = context.Process(target=run_worker, args=(self.worker_path, child_connection), daemon=True)
+        self.worker.start()
+        child_connection.close()
+        self.worker_busy = False
+        self.worker_paused = False
+
+    def restart_worker(self):
+        """结束当前的执行进程(不等待程序结束)，并启动新的执行进程"""
+        if self.output_job is not None:
+            self.root.after_cancel(self.output_job)
+            self.output_job = None
+        if self.worker is not None:
+            self.worker.kill()
+            self.worker.join()
+            self.worker_connection.close()
+        self.start_worker()
+
+    def start_session(self, kind, status, next_command=None):
+        """清空输出，在执行进程中开始新的运行('run')或调试('debug')
+
+        next_command 为开始调试后立即执行的调试命令，例如 ('run_to', 位置)。
+        """
         # 清空输出
         self.output_text.config(state=tk.NORMAL)
         self.output_text.delete(1.0, tk.END)
         self.output_text.config(state=tk.DISABLED)
-        
+
         self.state_text.config(state=tk.NORMAL)
         self.state_text.delete(1.0, tk.END)
         self.state_text.config(state=tk.DISABLED)
-        
-        # 获取代码
+
         code = self.code_text.get(1.0, tk.END)
-        
-        # 在新线程中执行
-        self.stop_execution_flag = False
-        self.execution_thread = threading.Thread(target=self.execute_code, args=(code, True))
-        self.execution_thread.daemon = True
-        self.execution_thread.start()
-        
-        self.status_bar.config(text="单步执行中...")
-    
-    def stop_execution(self):
-        """停止执行"""
-        self.stop_execution_flag = True
-        self.status_bar.config(text="执行已停止")
-    
-    def execute_code(self, code, single_step):
-        """执行代码"""
+        if self.worker_busy or self.worker is None or not self.worker.is_alive() \
+                or self.worker_path != self.interpreters[self.interpreter_version]:
+            # 上一次运行还没有结束，或切换了解释器
+            self.restart_worker()
+        self.send_debug_command((kind, code, self.breakpoint_positions(), next_command), status)
+
+    def send_debug_command(self, command, status):
+        """向执行进程发送命令，并开始定期读取它发回的输出和状态，直到执行结束或暂停"""
+        self.code_text.tag_remove('current_step', 1.0, tk.END)
+        self.worker_connection.send(command)
+        self.worker_busy = True
+        self.worker_paused = False
+        self.output_job = self.root.after(OUTPUT_POLL_MS, self.drain_output)
+        self.status_bar.config(text=status)
+
+    def drain_output(self):
+        """读取执行进程发回的消息，最多OUTPUT_BATCH_SIZE字节的输出一次写到输出区域，执行结束前定期重复"""
+        self.output_job = None
+        chunks = []
+        states = []
+        size = 0
+        result = None  # 执行结束或暂停时为 ('done', None)、('error', 错误信息) 或 ('paused', 位置)
         try:
-            # 重定向输出到我们的文本区域
-            import io
-            import contextlib
-            
-            old_stdout = sys.stdout
-            sys.stdout = io.StringIO()
-            
-            # 执行代码
-            self.interpreter.execute(code, single_step=single_step)
-            
-            # 获取输出
-            output = sys.stdout.getvalue()
-            sys.stdout = old_stdout
-            
-            # 更新UI
-            self.root.after(0, self.update_output, output)
-            
-            self.root.after(0, lambda: self.status_bar.config(text="执行完成"))
-            
-        except Exception as e:
-            self.root.after(0, self.show_error, str(e))
-    
+            while size < OUTPUT_BATCH_SIZE and self.worker_connection.poll():
+                kind, value = self.worker_connection.recv()
+                if kind == 'output':
+                    chunks.append(value)
+                    size += len(value)
+                elif kind == 'state':
+                    states.append(value)
+                else:
+                    result = kind, value
+                    break
+        except (EOFError, OSError):
+            result = 'error', "执行进程意外退出"
+
+        if chunks:
+            # 与解释器输出到文本流时相同，按字节值逐个转为字符
+            self.update_output(b''.join(chunks).decode('latin-1'))
+        if states:
+            self.update_state(''.join(states))
+        if result is None:
+            self.output_job = self.root.after(OUTPUT_POLL_MS, self.drain_output)
+            return
+
+        self.worker_busy = False
+        kind, value = result
+        if kind == 'paused':
+            self.worker_paused = True
+            self.show_current_step(value)
+        elif kind == 'done':
+            self.status_bar.config(text="执行完成")
+        else:
+            self.show_error(value)
+
+    def show_current_step(self, position):
+        """调试暂停时标出下一条要执行的指令"""
+        index = self.code_text.index(f"1.0 + {position} chars")
+        self.code_text.tag_add('current_step', index)
+        self.code_text.see(index)
+        line, column = index.split('.')
+        self.status_bar.config(text=f"已暂停: 第{line}行, 第{int(column) + 1}列")
+
     def update_output(self, output):
-        """更新输出区域"""
-        self.output_text.config(state=tk.NORMAL)
-        self.output_text.insert(tk.END, output)
-        self.output_text.see(tk.END)
-        self.output_text.config(state=tk.DISABLED)
-    
+        """更新输出区域，只保留最后OUTPUT_MAX_LINES行"""
+        self.append_text(self.output_text, output, OUTPUT_MAX_LINES)
+
+    def update_state(self, state):
+        """更新状态区域，只保留最后STATE_MAX_LINES行"""
+        self.append_text(self.state_text, state, STATE_MAX_LINES)
+
+    def append_text(self, widget, text, max_lines):
+        """在只读文本框末尾追加文本，超过max_lines行时删除最早的行"""
+        widget.config(state=tk.NORMAL)
+        widget.insert(tk.END, text)
+        lines = int(widget.index('end-1c').split('.')[0])
+        if lines > max_lines:
+            widget.delete('1.0', f"{lines - max_lines + 1}.0")
+        widget.see(tk.END)
+        widget.config(state=tk.DISABLED)
+
     def show_error(self, error_msg):
         """显示错误信息"""
         self.output_text.config(state=tk.NORMAL)
         self.output_text.insert(tk.END, f"\n错误: {error_msg}")
         self.output_text.see(tk.END)
         self.output_text.config(state=tk.DISABLED)
-        
+
         self.status_bar.config(text=f"执行错误: {error_msg}")
-    
+
     def show_help(self):
         """显示帮助文档"""
         help_window = tk.Toplevel(self.root)
         help_window.title("T语言帮助文档")
         help_window.geometry("800x600")
-        
+
         help_text = scrolledtext.ScrolledText(help_window, wrap=tk.WORD, font=("Consolas", 11))
         help_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
+
         # 加载帮助内容
         help_content = """
 Turing (T) 机器语言解释器 - 帮助文档
@@ -596,6 +773,12 @@ Turing (T) 机器语言解释器 - 帮助文档
   - 纸带B: 存储数据值
   纸带初始长度为500，会根据需要自动扩展或收缩。
 
+调试:
+  F9 在光标处的字符上设置或取消断点，F5 运行时在断点处暂停
+  F10 单步执行，Shift+F10 单步执行时跳过整个循环，Ctrl+F10 运行到光标处
+  暂停时下一条要执行的指令以黄色标出，F5 继续执行到下一个断点，Ctrl+F2 停止
+  没有断点时程序按完全优化后的指令执行，不受调试功能影响
+
 语法高亮:
   不同类型的指令会显示为不同颜色:
   - 基本操作: 蓝色
@@ -606,15 +789,96 @@ Turing (T) 机器语言解释器 - 帮助文档
 """
         help_text.insert(1.0, help_content)
         help_text.config(state=tk.DISABLED)
-    
+
     def show_about(self):
         """显示关于信息"""
         messagebox.showinfo("关于", "Turing (T) 语言 IDE\n\n一个基于Tkinter的T语言集成开发环境\n支持多版本解释器和语法高亮")
-    
+
     def run(self):
         """运行IDE"""
         self.root.mainloop()
 
+class WorkerStream(io.TextIOBase):
+    """执行进程的标准输出，解释器打印的状态信息作为 ('state', 文本) 通过管道发给IDE"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.connection.send(('state', text))
+        return len(text)
+
+def run_worker(interpreter_path, connection):
+    """执行进程的主函数: 加载解释器，循环接收并执行IDE发来的命令
+
+    命令:
+      ('run', 代码, 断点, None)          执行代码，有断点时在断点处暂停
+      ('debug', 代码, 断点, 调试命令)    开始调试，停在第一条指令之前，调试命令不为None时接着执行它
+      ('step',)、('step_over',)、('continue',)、('run_to', 位置)  调试暂停时继续执行
+    位置都是代码中的字符下标。程序输出按行以 ('output', bytes) 发回，状态信息以 ('state', 文本) 发回，
+    每个命令最后发送 ('paused', 位置)、('done', None) 或 ('error', 错误信息)。IDE关闭管道时退出。
+    """
+    spec = importlib.util.spec_from_file_location("interpreter_worker", interpreter_path)
+    interpreter_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(interpreter_module)
+
+    sys.stdout = WorkerStream(connection)
+    debugger = None
+    while True:
+        try:
+            command = connection.recv()
+        except EOFError:
+            return
+
+        try:
+            if command[0] in ('run', 'debug'):
+                kind, code, breakpoints, next_command = command
+                interpreter = interpreter_module.TuringInterpreter()
+                # IDE中没有程序输入，读到的是输入结束
+                interpreter.set_input(b'')
+                interpreter.set_output(lambda data: connection.send(('output', data)), line_buffered=True)
+                if kind == 'run' and not breakpoints:
+                    # 没有断点时按正常方式全速执行
+                    debugger = None
+                    interpreter.execute(code)
+                    connection.send(('done', None))
+                    continue
+                debugger = interpreter_module.Debugger(interpreter, code)
+                for position in breakpoints:
+                    debugger.add_breakpoint(position)
+                if kind == 'run':
+                    command = ('continue',)
+                elif next_command is not None:
+                    command = next_command
+            elif debugger is None:
+                # 调试已经结束后才收到的命令
+                connection.send(('done', None))
+                continue
+
+            if command[0] == 'step':
+                finished = debugger.step()
+            elif command[0] == 'step_over':
+                finished = debugger.step_over()
+            elif command[0] == 'run_to':
+                finished = debugger.run_to(command[1])
+            elif command[0] == 'continue':
+                finished = debugger.continue_execution()
+            else:
+                finished = debugger.finished
+
+            if finished:
+                debugger = None
+                connection.send(('done', None))
+            else:
+                debugger.interpreter.show_state()
+                connection.send(('paused', debugger.location()))
+        except Exception as e:
+            debugger = None
+            connection.send(('error', str(e)))
+
 def main():
     root = tk.Tk()
     ide = TuringIDE(root)
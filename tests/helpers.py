@@ -0,0 +1,68 @@
+"""测试共用的程序和执行函数
+
+参考语义是 execute_stepwise 逐字符解释执行未预处理折叠的代码，
+其他执行方式的输出、纸带、指针和结束时的 instruction_ptr 都应与它相同。
+"""
+import os
+import sys
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TEST_DIR, '..', 'src', 'interpreter'))
+
+import V1
+
+PROGRAM_DIR = os.path.join(TEST_DIR, '..', 'benchmarks', 'programs')
+
+# 覆盖各种优化的小程序: 清零、乘法循环、扫描、偏移块、纸带A的指令和输入
+SNIPPETS = [
+    '++++++[->++++++++<]>+.[-]>>+++[-<+<++>>]<<.',
+    '+>+>+>+>+<<<<[>]>.+[<]<.',
+    '++++[>++++++<-]>[>+>++<<-]>.>.<<[->>>+<<<]>>>.',
+    '+++!@>++#$<%^.>&*.',
+    ',[.,]',
+    ',[->+>+<<]>>[-<<+>>]<.<.',
+    '+[->,]<<[.<]',
+    '+++++[>++++++++++<-]>++.',
+]
+
+def make_input(size):
+    """生成不含0字节的确定性输入"""
+    return bytes(i % 255 + 1 for i in range(size))
+
+def read_program(name):
+    with open(os.path.join(PROGRAM_DIR, name + '.t')) as f:
+        return f.read()
+
+def new_interpreter(data=b''):
+    """输出收集到 interpreter.test_output 中的解释器"""
+    interpreter = V1.TuringInterpreter()
+    interpreter.test_output = bytearray()
+    interpreter.set_output(interpreter.test_output.extend, line_buffered=False)
+    interpreter.set_input(data)
+    return interpreter
+
+def state(interpreter):
+    """(输出, 纸带A, 纸带B, 指针, 指令位置)，纸带去掉末尾的0"""
+    return (bytes(interpreter.test_output), bytes(interpreter.tape_a).rstrip(b'\0'),
+            bytes(interpreter.tape_b).rstrip(b'\0'), interpreter.pointer, interpreter.instruction_ptr)
+
+def run(code, data=b'', optimize_level=1, backend='bytecode', interpreter=None):
+    """用 execute 执行代码，返回 state"""
+    interpreter = interpreter or new_interpreter(data)
+    interpreter.optimize_level = optimize_level
+    interpreter.backend = backend
+    interpreter.execute(code)
+    return state(interpreter)
+
+def run_stepwise(code, data=b''):
+    """用 execute_stepwise 逐字符执行代码，返回 state"""
+    interpreter = new_interpreter(data)
+    interpreter.code = interpreter.preprocess_code(code)
+    interpreter.instruction_ptr = 0
+    interpreter.pointer = 0
+    try:
+        interpreter.execute_stepwise()
+    finally:
+        interpreter.output.flush()
+    interpreter.adjust_tape_size()
+    return state(interpreter)
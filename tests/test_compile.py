@@ -0,0 +1,59 @@
+"""编译为折叠的指令列表后执行，结果与逐字符执行相同"""
+import unittest
+
+from helpers import V1, SNIPPETS, make_input, new_interpreter, read_program, run, run_stepwise
+
+class CompileTest(unittest.TestCase):
+
+    def test_snippets(self):
+        data = make_input(40)
+        for code in SNIPPETS:
+            with self.subTest(code=code):
+                expected = run_stepwise(code, data)
+                self.assertEqual(run(code, data, optimize_level=0), expected)
+                self.assertEqual(run(code, data), expected)
+
+    def test_benchmark_programs(self):
+        for name, data in [('hello', b''), ('tape_ops', b''), ('pointer_walk', b''),
+                           ('input_heavy', make_input(2000))]:
+            with self.subTest(name=name):
+                code = read_program(name)
+                expected = run_stepwise(code, data)
+                self.assertEqual(run(code, data, optimize_level=0), expected)
+                self.assertEqual(run(code, data), expected)
+
+    def test_instruction_ptr_after_run(self):
+        code = '+++++[>++++++++++<-]>++.'
+        interpreter = new_interpreter()
+        interpreter.execute(code)
+        self.assertEqual(interpreter.instruction_ptr, len(code))
+        self.assertEqual(interpreter.pointer, 1)
+
+    def test_state_after_interrupt(self):
+        class Interrupting:
+            """读到第三个字节时模拟Ctrl-C"""
+            reads = 0
+
+            def read(self, size):
+                self.reads += 1
+                if self.reads > 2:
+                    raise KeyboardInterrupt
+                return b'a'
+
+        code = '++++[>+>,<<-]+++'
+        interpreter = new_interpreter()
+        interpreter.set_input(Interrupting(), chunk_size=1)
+        with self.assertRaises(KeyboardInterrupt):
+            interpreter.execute(code)
+        # 中断在循环体中，位置为循环体的开头
+        self.assertEqual(interpreter.instruction_ptr, code.index('[') + 1)
+        self.assertEqual(interpreter.tape_b[0], 2)
+
+    def test_unmatched_brackets(self):
+        for code in ('+[', '+]'):
+            with self.subTest(code=code):
+                with self.assertRaises(RuntimeError):
+                    new_interpreter().execute(code)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,329 @@
+"""解释器的回归测试
+
+用法: python -m pytest -q tests 或 python -m unittest discover tests
+
+各优化级别和后端的结果都与不优化的字节码解释器比较；
+编译缓存(.tpc)、结果缓存(.tro)、字节码文件(.tbc)和检查点(.tck)测试保存后再读回的往返。
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TEST_DIR, '..', 'src', 'interpreter'))
+
+import V1
+
+PROGRAM_DIR = os.path.join(TEST_DIR, '..', 'benchmarks', 'programs')
+
+# 覆盖各种优化的小程序: 清零、乘法循环、扫描、偏移块、纸带A的指令和输入
+SNIPPETS = [
+    '++++++[->++++++++<]>+.[-]>>+++[-<+<++>>]<<.',
+    '+>+>+>+>+<<<<[>]>.+[<]<.',
+    '++++[>++++++<-]>[>+>++<<-]>.>.<<[->>>+<<<]>>>.',
+    '+++!@>++#$<%^.>&*.',
+    ',[.,]',
+    ',[->+>+<<]>>[-<<+>>]<.<.',
+    '+[->,]<<[.<]',
+]
+
+def make_input(size):
+    """生成不含0字节的确定性输入"""
+    return bytes(i % 255 + 1 for i in range(size))
+
+def run(code, data=b'', optimize_level=1, backend='bytecode', interpreter=None):
+    """执行代码，返回 (输出, 纸带A, 纸带B, 指针)，纸带去掉末尾的0"""
+    interpreter = interpreter or V1.TuringInterpreter()
+    interpreter.optimize_level = optimize_level
+    interpreter.backend = backend
+    output = bytearray()
+    interpreter.set_output(output.extend, line_buffered=False)
+    interpreter.set_input(data)
+    interpreter.execute(code)
+    return state(interpreter, output)
+
+def state(interpreter, output):
+    return (bytes(output), bytes(interpreter.tape_a).rstrip(b'\0'),
+            bytes(interpreter.tape_b).rstrip(b'\0'), interpreter.pointer)
+
+def read_program(name):
+    with open(os.path.join(PROGRAM_DIR, name + '.t')) as f:
+        return f.read()
+
+class OptimizationTest(unittest.TestCase):
+    """优化后的指令与逐条执行未优化的指令结果相同"""
+
+    def test_snippets(self):
+        data = make_input(40)
+        for code in SNIPPETS:
+            with self.subTest(code=code):
+                expected = run(code, data, optimize_level=0)
+                for backend in ('bytecode', 'python', 'tiered'):
+                    self.assertEqual(run(code, data, backend=backend), expected, backend)
+
+    def test_benchmark_programs(self):
+        for name, data in [('hello', b''), ('tape_ops', b''), ('input_heavy', make_input(2000))]:
+            with self.subTest(name=name):
+                code = read_program(name)
+                self.assertEqual(run(code, data), run(code, data, optimize_level=0))
+
+    def test_idioms_are_recognized(self):
+        interpreter = V1.TuringInterpreter()
+        program = interpreter.build_program('>[-]<[->+++>+<<]>[>]')
+        ops = [op for op, _ in program]
+        for op in (V1.OP_CLEAR, V1.OP_MULADD, V1.OP_SCAN):
+            self.assertIn(op, ops)
+
+    def test_prefix_is_evaluated(self):
+        code = read_program('hello')
+        interpreter = V1.TuringInterpreter()
+        program = interpreter.build_program(interpreter.preprocess_code(code))
+        self.assertEqual(program[0][0], V1.OP_PRESET)
+        self.assertEqual(run(code), run(code, optimize_level=0))
+
+    def test_prefix_stops_at_input(self):
+        interpreter = V1.TuringInterpreter()
+        program = interpreter.build_program('++++.,[.,]')
+        self.assertEqual(program[0][0], V1.OP_PRESET)
+        self.assertEqual(run('++++.,[.,]', b'ab'), run('++++.,[.,]', b'ab', optimize_level=0))
+
+    def test_prefix_skipped_for_python_backend(self):
+        interpreter = V1.TuringInterpreter()
+        interpreter.backend = 'python'
+        program = interpreter.build_program(interpreter.preprocess_code(read_program('hello')))
+        self.assertNotEqual(program[0][0], V1.OP_PRESET)
+
+    def test_large_prefix_is_not_recorded(self):
+        # 前缀的输出超过PRESET_MAX_SIZE时不预先执行
+        code = '+' * 65 + '>' + '+' * 255 + '[<' + '.' * 300 + '>-]'
+        interpreter = V1.TuringInterpreter()
+        program = interpreter.build_program(code)
+        self.assertNotEqual(program[0][0], V1.OP_PRESET)
+        self.assertEqual(run(code), run(code, optimize_level=0))
+
+class ProgramCacheTest(unittest.TestCase):
+    """编译缓存(.tpc)"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_round_trip(self):
+        cache = V1.ProgramCache(self.directory.name)
+        code = V1.TuringInterpreter().preprocess_code(read_program('hanoi'))
+        compiler = V1.TuringInterpreter()
+        compiler.cache = cache
+        program = compiler.build_program(code)
+        files = [name for name in os.listdir(self.directory.name) if name.endswith('.tpc')]
+        self.assertEqual(len(files), 1)
+        self.assertEqual(cache.load(cache.key(code, 1)), program)
+
+        # 第二次编译直接读取缓存
+        compiler = V1.TuringInterpreter()
+        compiler.cache = cache
+        self.assertEqual(compiler.build_program(code), program)
+
+    def test_corrupt_file_is_a_miss(self):
+        cache = V1.ProgramCache(self.directory.name)
+        key = cache.key('+.', 1)
+        with open(cache.path(key), 'wb') as f:
+            f.write(b'not marshal data')
+        self.assertIsNone(cache.load(key))
+
+    def test_eviction(self):
+        cache = V1.ProgramCache(self.directory.name, max_size=0)
+        cache.store(cache.key('+.', 1), [(V1.OP_ADD, 1), (V1.OP_OUT, None)])
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+class ResultCacheTest(unittest.TestCase):
+    """结果缓存(.tro)"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.results = V1.ResultCache(self.directory.name)
+
+    def run_memoized(self, code):
+        interpreter = V1.TuringInterpreter()
+        output = bytearray()
+        interpreter.set_output(output.extend, line_buffered=False)
+        interpreter.set_input(b'')
+        interpreter.execute_memoized(code, self.results)
+        return state(interpreter, output)
+
+    def test_replay(self):
+        code = read_program('hello')
+        first = self.run_memoized(code)
+        self.assertEqual(first, run(code))
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+        self.assertEqual(self.run_memoized(code), first)
+
+    def test_programs_reading_input_are_not_cached(self):
+        self.run_memoized(',[.,]')
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+class BytecodeFileTest(unittest.TestCase):
+    """字节码文件(.tbc)"""
+
+    def test_encode_decode(self):
+        for code in SNIPPETS + [read_program('hello'), read_program('mandelbrot')]:
+            interpreter = V1.TuringInterpreter()
+            program = interpreter.build_program(interpreter.preprocess_code(code))
+            bytecode = V1.BytecodeProgram.from_bytes(V1.encode_bytecode(program))
+            try:
+                self.assertEqual(list(bytecode), program)
+            finally:
+                bytecode.close()
+
+    def test_compile_file_and_execute(self):
+        data = make_input(500)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'input_heavy.tbc')
+            V1.TuringInterpreter().compile_file(os.path.join(PROGRAM_DIR, 'input_heavy.t'), path)
+            bytecode = V1.BytecodeProgram(path)
+            try:
+                interpreter = V1.TuringInterpreter()
+                output = bytearray()
+                interpreter.set_output(output.extend, line_buffered=False)
+                interpreter.set_input(data)
+                interpreter.execute_program(bytecode)
+            finally:
+                bytecode.close()
+        self.assertEqual(bytes(output), run(read_program('input_heavy'), data)[0])
+
+    def test_invalid_file(self):
+        with self.assertRaises(ValueError):
+            V1.BytecodeProgram.from_bytes(b'TBC')
+
+class CheckpointTest(unittest.TestCase):
+    """检查点(.tck)"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'state.tck')
+
+    def interrupt_and_resume(self, code, data, steps):
+        """执行steps条指令后保存检查点，在新的解释器中恢复执行，返回两段输出之和"""
+        interpreter = V1.TuringInterpreter()
+        output = bytearray()
+        interpreter.set_output(output.extend, line_buffered=False)
+        interpreter.set_input(data, chunk_size=100)
+        program = interpreter.build_program(interpreter.preprocess_code(code))
+        self.assertFalse(interpreter.run_compiled(program, 0, steps))
+        interpreter.save_checkpoint(self.path, program)
+
+        resumed = V1.TuringInterpreter()
+        resumed.set_output(output.extend, line_buffered=False)
+        resumed.set_input(b'')
+        resumed.resume(self.path)
+        return state(resumed, output)
+
+    def test_resume(self):
+        code = read_program('hanoi')
+        self.assertEqual(self.interrupt_and_resume(code, b'', 20000), run(code))
+
+    def test_resume_with_pending_input(self):
+        code = read_program('input_heavy')
+        data = make_input(3000)
+        self.assertEqual(self.interrupt_and_resume(code, data, 5000), run(code, data))
+
+    def test_resume_paged_tape(self):
+        # 指针跳得很远，纸带换成PagedTape
+        code = '+' + '>' * 3000000 + '+[' + '<' * 1000000 + '+]' + '+' * 64 + '.'
+        interpreter = V1.TuringInterpreter()
+        program = interpreter.build_program(code)
+        interpreter.set_output(lambda data: None)
+        interpreter.run_compiled(program, 0, 2)
+        self.assertIsInstance(interpreter.tape_b, V1.PagedTape)
+        interpreter.save_checkpoint(self.path, program)
+        self.assertLess(os.path.getsize(self.path), 1 << 16)
+
+        resumed = V1.TuringInterpreter()
+        loaded = resumed.load_checkpoint(self.path)
+        self.assertEqual(loaded, list(program))
+        self.assertIsInstance(resumed.tape_b, V1.PagedTape)
+        self.assertEqual(resumed.tape_b.pages.keys(), interpreter.tape_b.pages.keys())
+        self.assertEqual(resumed.pointer, interpreter.pointer)
+
+    def test_dense_growth_stays_bytearray(self):
+        interpreter = V1.TuringInterpreter()
+        interpreter.run_compiled(interpreter.build_program('+[>+]'), 0, 3000000)
+        self.assertIsInstance(interpreter.tape_b, bytearray)
+
+    def test_invalid_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'TCK')
+        with self.assertRaises(ValueError):
+            V1.TuringInterpreter().load_checkpoint(self.path)
+
+class DebuggerTest(unittest.TestCase):
+    """调试器"""
+
+    SOURCE = 'set ++++++[->++++++++<]\nprint >+. done\n'
+
+    def setUp(self):
+        self.interpreter = V1.TuringInterpreter()
+        self.output = bytearray()
+        self.interpreter.set_output(self.output.extend, line_buffered=False)
+        self.debugger = V1.Debugger(self.interpreter, self.SOURCE)
+
+    def test_breakpoint(self):
+        dot = self.SOURCE.index('.')
+        self.debugger.add_breakpoint(dot)
+        self.assertFalse(self.debugger.continue_execution())
+        self.assertEqual(self.debugger.location(), dot)
+        self.assertEqual(bytes(self.output), b'')
+        self.assertTrue(self.debugger.continue_execution())
+        self.assertEqual(bytes(self.output), b'1')
+
+    def test_breakpoint_on_comment_stops_at_next_instruction(self):
+        self.debugger.add_breakpoint(self.SOURCE.index('print'))
+        self.debugger.continue_execution()
+        self.assertEqual(self.debugger.location(), self.SOURCE.index('>+.'))
+
+    def test_step_and_step_over(self):
+        for _ in range(6):
+            self.debugger.step()
+        self.assertEqual(self.debugger.location(), self.SOURCE.index('['))
+        self.assertFalse(self.debugger.step_over())
+        self.assertEqual(self.debugger.location(), self.SOURCE.index('>+.'))
+        self.assertEqual(self.interpreter.tape_b[1], 48)
+        self.debugger.step()
+        self.assertEqual(self.debugger.location(), self.SOURCE.index('+.'))
+
+    def test_run_to(self):
+        self.assertFalse(self.debugger.run_to(self.SOURCE.index('.')))
+        self.assertEqual(self.interpreter.tape_b[1], 49)
+        self.assertTrue(self.debugger.continue_execution())
+        self.assertIsNone(self.debugger.location())
+
+class TieredTest(unittest.TestCase):
+    """分层执行"""
+
+    def test_large_loops_are_rejected(self):
+        code = read_program('transfer_chain')
+        interpreter = V1.TuringInterpreter()
+        result = run(code, backend='tiered', interpreter=interpreter)
+        self.assertTrue(interpreter.tier_stats.rejected)
+        self.assertEqual(result, run(code))
+
+class BatchTest(unittest.TestCase):
+    """批量执行"""
+
+    def test_results_in_input_order(self):
+        program = V1.Program(',[.,]')
+        inputs = (b'%d;' % i for i in range(20))
+        results = list(V1.run_batch(program, inputs, jobs=2))
+        self.assertEqual([result.input for result in results], list(range(20)))
+        self.assertEqual(b''.join(result.output for result in results),
+                         b''.join(b'%d;' % i for i in range(20)))
+
+    def test_timeout(self):
+        [result] = V1.run_batch(V1.Program('+[]'), [b''], jobs=1, timeout=0.1)
+        self.assertEqual(result.status, 'timeout')
+        self.assertLess(result.elapsed, 1.0)
+
+if __name__ == '__main__':
+    unittest.main()